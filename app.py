@@ -2,14 +2,23 @@
 
 from flask import Flask, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from sqlalchemy.orm import joinedload
 from config import Config
-from models import db, User, NewsSource, Article
+from models import db, User, Article, DataVersion, user_favorites
 from forms import LoginForm, RegistrationForm, SourceSelectionForm
-from news_fetcher import get_user_articles, fetch_news_from_sources
+from news_fetcher import get_user_articles
+from search import search_articles
+from migrations import upgrade_schema
+from pagination import paginate_feed
+from cache import news_summary_cache
+from topic_index import topic_scope
+from sampling import random_articles
+from story_clusters import collapse_stories
 from cli_commands import register_commands
+from query_guard import init_query_guard
+from feed_scheduler import run_scheduler
 from datetime import datetime
 import threading
-import time
 import random
 
 
@@ -33,6 +42,9 @@ def create_app():
     # Регистрация CLI команд
     register_commands(app)
 
+    # Счетчик SQL-запросов на HTTP-запрос (включается QUERY_COUNT_LIMIT)
+    init_query_guard(app)
+
     return app
 
 
@@ -40,18 +52,10 @@ app = create_app()
 
 
 def auto_update_news():
-    """Фоновая задача для автоматического обновления новостей каждые 2 часа"""
+    """Фоновая задача обновления новостей: планировщик опрашивает каждую ленту
+    со своей частотой; во всех воркерах, кроме лидера, он только ждет"""
     with app.app_context():
-        while True:
-            try:
-                print("🔄 Автоматическое обновление новостей...")
-                count = fetch_news_from_sources(days_back=1)
-                print(f"✅ Загружено {count} новых статей")
-            except Exception as e:
-                print(f"❌ Ошибка обновления новостей: {e}")
-
-            # Ждем 2 часа (7200 секунд)
-            time.sleep(7200)
+        run_scheduler()
 
 
 # Запуск фоновой задачи
@@ -64,42 +68,30 @@ def start_background_tasks():
 @app.route('/')
 def index():
     page = request.args.get('page', 1, type=int)
+    after = request.args.get('after')
+    before = request.args.get('before')
     q = request.args.get('q', "").strip()
 
-    if current_user.is_authenticated:
-        articles = get_user_articles(current_user, page, app.config['POSTS_PER_PAGE'])
-        if q:
-            articles = Article.query.filter(
-                (Article.title.ilike(f"%{q}%")) |
-                (Article.summary.ilike(f"%{q}%")) |
-                (Article.description.ilike(f"%{q}%"))
-            ).order_by(
-                Article.url_to_image.isnot(None).desc(),
-                Article.published_at.desc()
-            ).paginate(
-                page=page, per_page=app.config['POSTS_PER_PAGE'], error_out=False
-            )
+    if q:
+        # Полнотекстовый поиск по всем статьям с сортировкой по релевантности
+        articles = search_articles(q).options(joinedload(Article.source)).paginate(
+            page=page, per_page=app.config['POSTS_PER_PAGE'], error_out=False
+        )
+    elif current_user.is_authenticated:
+        articles = get_user_articles(
+            current_user, page, app.config['POSTS_PER_PAGE'], after, before
+        )
     else:
-        if q:
-            articles = Article.query.filter(
-                (Article.title.ilike(f"%{q}%")) |
-                (Article.summary.ilike(f"%{q}%")) |
-                (Article.description.ilike(f"%{q}%"))
-            ).order_by(
-                Article.url_to_image.isnot(None).desc(),
-                Article.published_at.desc()
-            ).paginate(
-                page=page, per_page=app.config['POSTS_PER_PAGE'], error_out=False
-            )
-        else:
-            articles = Article.query.order_by(
-                Article.url_to_image.isnot(None).desc(),
-                Article.published_at.desc()
-            ).paginate(
-                page=page, per_page=app.config['POSTS_PER_PAGE'], error_out=False
-            )
+        articles = paginate_feed(
+            collapse_stories(Article.query), page, app.config['POSTS_PER_PAGE'], after, before
+        )
+
+    # Состояние "в избранном" для всей страницы одним запросом
+    favorite_ids = current_user.favorite_ids(
+        article.id for article in articles.items
+    ) if current_user.is_authenticated else set()
 
-    return render_template('index.html', articles=articles, q=q)
+    return render_template('index.html', articles=articles, q=q, favorite_ids=favorite_ids)
 
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -154,19 +146,16 @@ def settings():
     form = SourceSelectionForm()
 
     if form.validate_on_submit():
-        current_user.selected_sources = []
-        selected_source_ids = form.sources.data
-        for source_id in selected_source_ids:
-            source = NewsSource.query.get(source_id)
-            if source:
-                current_user.selected_sources.append(source)
-
+        # Варианты формы - только существующие активные источники, так что
+        # отмеченные id пишем в user_sources без проверки каждого
+        current_user.set_selected_sources(form.sources.data)
         db.session.commit()
+        current_user.invalidate_selected_sources()
         flash('Настройки источников сохранены!', 'success')
         return redirect(url_for('index'))
 
     if request.method == 'GET':
-        form.sources.data = [source.id for source in current_user.selected_sources]
+        form.sources.data = list(current_user.get_selected_source_ids())
 
     return render_template('settings.html', form=form)
 
@@ -182,8 +171,7 @@ def article_detail(article_id):
 def toggle_favorite(article_id):
     article = Article.query.get_or_404(article_id)
 
-    if current_user.is_favorite(article):
-        current_user.remove_favorite(article)
+    if current_user.remove_favorite(article):
         status = 'removed'
     else:
         current_user.add_favorite(article)
@@ -198,13 +186,15 @@ def favorites():
     page = request.args.get('page', 1, type=int)
     per_page = app.config.get('POSTS_PER_PAGE', 10)
 
-    favorites_query = Article.query.join(User.favorites).filter(
-        User.id == current_user.id
-    ).order_by(
-        Article.url_to_image.isnot(None).desc(),
-        Article.published_at.desc()
+    favorites_query = Article.query.join(
+        user_favorites, user_favorites.c.article_id == Article.id
+    ).filter(
+        user_favorites.c.user_id == current_user.id
+    )
+    articles = paginate_feed(
+        favorites_query, page, per_page,
+        request.args.get('after'), request.args.get('before')
     )
-    articles = favorites_query.paginate(page=page, per_page=per_page, error_out=False)
 
     return render_template('favorites.html', articles=articles)
 
@@ -220,16 +210,11 @@ def game():
 @login_required
 def get_random_articles():
     """API для получения случайных статей для игры"""
-    count = request.args.get('count', 5, type=int)
-
-    # Получаем случайные статьи
-    if current_user.selected_sources:
-        source_ids = [source.id for source in current_user.selected_sources]
-        articles = Article.query.filter(
-            Article.source_id.in_(source_ids)
-        ).order_by(db.func.random()).limit(count).all()
-    else:
-        articles = Article.query.order_by(db.func.random()).limit(count).all()
+    count = min(request.args.get('count', 5, type=int), Config.GAME_MAX_ARTICLES)
+
+    # Получаем случайные статьи (пробы по первичному ключу, без сортировки таблицы)
+    source_ids = current_user.get_selected_source_ids()
+    articles = random_articles(count, source_ids)
 
     # Формируем данные для ответа
     articles_data = []
@@ -252,60 +237,83 @@ def news_summary():
         topic = request.args.get('topic', None)
         print(f"🔍 Запрос выжимки. Тема: {topic}")
 
-        if current_user.selected_sources:
-            source_ids = [source.id for source in current_user.selected_sources]
-            articles_query = Article.query.filter(
+        source_ids = current_user.get_selected_source_ids()
+
+        # Версия данных растет с каждой записью статей, сводок и тем: выжимки,
+        # посчитанные до изменений (в т.ч. в другом процессе), не переиспользуются
+        data_version = DataVersion.current()
+        cache_key = (source_ids, topic, data_version)
+        cached = news_summary_cache.get(cache_key)
+        if cached is not None:
+            print("⚡ Выжимка из кэша")
+            return jsonify({'success': True, 'data': cached})
+
+        # Источники грузим вместе со статьями: выжимка берет article.source.name
+        articles_query = Article.query.options(joinedload(Article.source))
+        if source_ids:
+            articles_query = articles_query.filter(
                 Article.source_id.in_(source_ids)
             ).order_by(Article.published_at.desc())
             print(f"📊 Пользователь выбрал {len(source_ids)} источников")
         else:
-            articles_query = Article.query.order_by(
+            articles_query = articles_query.order_by(
                 Article.published_at.desc()
             )
             print(f"📊 Используем все источники")
-
-        if topic:
-            from summary_generator import filter_articles_by_topic
-            all_articles = articles_query.limit(100).all()
-            print(f"📰 Получено {len(all_articles)} статей для фильтрации")
-            articles = filter_articles_by_topic(all_articles, topic)
-            print(f"✅ После фильтрации осталось {len(articles)} статей по теме '{topic}'")
+        # Один сюжет из нескольких источников - одна статья в выжимке
+        articles_query = collapse_stories(articles_query, source_ids)
+
+        scope = topic_scope(topic, source_ids) if topic else None
+        if scope is not None:
+            # Индексная выборка по предрасчитанным оценкам тем
+            print(f"✅ Статьи по теме '{topic}' из индекса тем")
+        elif topic:
+            # Неизвестная тема - как раньше, без фильтрации
+            scope = articles_query.limit(100)
+            print(f"📰 Тема '{topic}' не распознана, берем свежие статьи")
         else:
-            articles = articles_query.limit(15).all()
-            print(f"📰 Получено {len(articles)} статей без фильтрации")
+            scope = articles_query.limit(15)
+            print("📰 Берем свежие статьи без фильтрации")
+
+        # Статьи выжимки не загружаются целиком: статистику по ним БД считает
+        # по подзапросу id, а в текст идут только самые свежие
+        max_articles = 5
+        scope_ids = db.select(scope.with_entities(Article.id).subquery().c.id)
+        articles = Article.query.options(joinedload(Article.source)).filter(
+            Article.id.in_(scope_ids)
+        ).order_by(Article.published_at.desc()).limit(max_articles).all()
 
         if not articles:
             print(f"⚠️ Новости по теме '{topic}' не найдены")
-            return jsonify({
-                'success': True,
-                'data': {
-                    'summary': f'По выбранной теме новостей не найдено.',
-                    'top_articles': [],
-                    'generated_at': datetime.now().strftime('%d.%m.%Y %H:%M'),
-                    'total_sources': 0,
-                    'topic': topic
-                }
-            })
-
-        from summary_generator import generate_news_summary, get_summary_statistics
-
-        print(f"🤖 Генерируем выжимку из {len(articles)} статей...")
-        summary_data = generate_news_summary(articles, max_articles=5, topic=topic)
-        stats = get_summary_statistics(articles)
+            data = {
+                'summary': f'По выбранной теме новостей не найдено.',
+                'top_articles': [],
+                'generated_at': datetime.now().strftime('%d.%m.%Y %H:%M'),
+                'total_sources': 0,
+                'topic': topic
+            }
+            news_summary_cache.set(cache_key, data)
+            return jsonify({'success': True, 'data': data})
+
+        from summary_generator import generate_news_summary
+
+        print("🤖 Генерируем выжимку...")
+        summary_data = generate_news_summary(
+            articles, max_articles=max_articles, topic=topic, scope=scope_ids
+        )
 
         print(f"✅ Выжимка сгенерирована успешно")
 
-        return jsonify({
-            'success': True,
-            'data': {
-                'summary': summary_data['summary'],
-                'top_articles': summary_data['top_articles'],
-                'generated_at': summary_data['generated_at'].strftime('%d.%m.%Y %H:%M'),
-                'total_sources': len(set([a['source'] for a in summary_data['top_articles']])),
-                'statistics': stats,
-                'topic': topic
-            }
-        })
+        data = {
+            'summary': summary_data['summary'],
+            'top_articles': summary_data['top_articles'],
+            'generated_at': summary_data['generated_at'].strftime('%d.%m.%Y %H:%M'),
+            'total_sources': len(set([a['source'] for a in summary_data['top_articles']])),
+            'statistics': summary_data['statistics'],
+            'topic': topic
+        }
+        news_summary_cache.set(cache_key, data)
+        return jsonify({'success': True, 'data': data})
 
     except Exception as e:
         print(f"❌ Ошибка генерации выжимки: {e}")
@@ -317,9 +325,16 @@ def news_summary():
         }), 500
 
 
+@app.route('/api/cache-stats')
+@login_required
+def cache_stats():
+    """Счетчики кэша выжимок текущего процесса"""
+    return jsonify({'news_summary': news_summary_cache.stats()})
+
+
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
         # В продакшене фоновые задачи не запускаем здесь
         # start_background_tasks()
 
@@ -0,0 +1,97 @@
+# news_aggregator/article_stats.py
+
+from datetime import datetime, timedelta
+from models import db, Article, NewsSource
+
+# Порядок и названия корзин как в analyze_time_distribution
+TIME_BUCKETS = ['Последний час', 'Последние 3 часа', 'Сегодня', 'Вчера', 'Раньше']
+
+
+def _scope(article_ids):
+    """Условие на набор статей: список id или подзапрос, возвращающий id.
+
+    С подзапросом (выборка выжимки с фильтрами и LIMIT) агрегаты считаются
+    без загрузки самих статей.
+    """
+    return Article.id.in_(article_ids)
+
+
+def source_counts(article_ids):
+    """Число статей по источникам одним GROUP BY: {name: count}, по убыванию.
+
+    Группировка по названию: источники с одинаковым названием (например,
+    RSS и NewsAPI одного издания) считаются вместе, как в Counter по
+    article.source.name. При равенстве выше источник с более свежей
+    статьей - так же, как Counter.most_common по ленте, отсортированной по дате.
+    """
+    count = db.func.count(Article.id)
+    rows = db.session.query(
+        NewsSource.name, count
+    ).join(
+        Article, Article.source_id == NewsSource.id
+    ).filter(
+        _scope(article_ids)
+    ).group_by(
+        NewsSource.name
+    ).order_by(
+        count.desc(),
+        db.func.max(Article.published_at).desc()
+    ).all()
+    return {name: n for name, n in rows}
+
+
+def time_distribution(article_ids, now=None):
+    """Распределение статей по давности одним GROUP BY по корзинам"""
+    now = now or datetime.now()
+    bucket = db.case(
+        (Article.published_at > now - timedelta(hours=1), 0),
+        (Article.published_at > now - timedelta(hours=3), 1),
+        (Article.published_at > now - timedelta(days=1), 2),
+        (Article.published_at > now - timedelta(days=2), 3),
+        else_=4
+    )
+    rows = db.session.query(
+        bucket, db.func.count(Article.id)
+    ).filter(
+        _scope(article_ids)
+    ).group_by(bucket).all()
+
+    buckets = dict.fromkeys(TIME_BUCKETS, 0)
+    for index, n in rows:
+        buckets[TIME_BUCKETS[index]] = n
+    return buckets
+
+
+def today_count(article_ids, today=None):
+    """Сколько статей опубликовано за календарный день today"""
+    start = datetime.combine(today or datetime.now().date(), datetime.min.time())
+    return db.session.query(db.func.count(Article.id)).filter(
+        _scope(article_ids),
+        Article.published_at >= start,
+        Article.published_at < start + timedelta(days=1)
+    ).scalar()
+
+
+def statistics_from(counts, today_articles):
+    """Статистика в формате get_summary_statistics из уже посчитанных
+    source_counts и today_count"""
+    if not counts:
+        return {
+            'total_articles': 0,
+            'today_articles': 0,
+            'sources_count': 0,
+            'top_source': 'Нет данных'
+        }
+
+    return {
+        'total_articles': sum(counts.values()),
+        'today_articles': today_articles,
+        'sources_count': len(counts),
+        'top_source': next(iter(counts))
+    }
+
+
+def summary_statistics(article_ids, today=None):
+    """Статистика для выжимки в формате get_summary_statistics: два небольших запроса"""
+    counts = source_counts(article_ids)
+    return statistics_from(counts, today_count(article_ids, today) if counts else 0)
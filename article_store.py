@@ -0,0 +1,132 @@
+# news_aggregator/article_store.py
+
+import sqlite3
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from models import db, NewsSource, Article, DataVersion
+from topic_index import index_article_topics
+from story_clusters import story_signature, assign_stories
+
+# Сколько строк пишем одним INSERT; у старых SQLite лимит 999 параметров
+INSERT_CHUNK_SIZE = 500
+SQLITE_INSERT_CHUNK_SIZE = 90
+
+# INSERT ... ON CONFLICT ... RETURNING появился в SQLite 3.35
+SQLITE_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def find_existing_urls(urls, chunk_size=500):
+    """Возвращает множество URL, которые уже есть в БД.
+
+    Один запрос на пачку из chunk_size ссылок вместо запроса на каждую статью.
+    """
+    urls = list(dict.fromkeys(url for url in urls if url))
+    existing = set()
+
+    for start in range(0, len(urls), chunk_size):
+        chunk = urls[start:start + chunk_size]
+        rows = db.session.query(Article.url).filter(Article.url.in_(chunk)).all()
+        existing.update(row.url for row in rows)
+
+    return existing
+
+
+def load_source_map(key='source_id'):
+    """Загружает все источники одним запросом: значение поля key -> NewsSource"""
+    return {getattr(source, key): source for source in NewsSource.query.all()}
+
+
+def insert_articles(rows):
+    """Пакетно вставляет статьи, дубликаты по Article.url пропускает сама БД.
+
+    rows - список словарей с полями Article. Коммит остается за вызывающим,
+    как и сброс кэшей статей (invalidate_article_caches) - после коммита.
+    Возвращает список (id, url) реально вставленных строк, так что повтор
+    ссылки (в соседней ленте или у параллельного загрузчика) не откатывает пачку.
+    """
+    if not rows:
+        return []
+
+    rows = _normalize_rows(rows)
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        inserted = _insert_on_conflict(postgresql.insert, rows, INSERT_CHUNK_SIZE)
+    elif dialect == 'sqlite' and SQLITE_SUPPORTS_RETURNING:
+        inserted = _insert_on_conflict(sqlite.insert, rows, SQLITE_INSERT_CHUNK_SIZE)
+    else:
+        inserted = _insert_one_by_one(rows)
+
+    if inserted:
+        # Оценки тем считаем сразу при загрузке, по данным вставленных строк
+        by_url = {row['url']: row for row in rows}
+        index_article_topics(
+            SimpleNamespace(
+                id=article_id,
+                title=by_url[url].get('title'),
+                description=by_url[url].get('description'),
+                summary=by_url[url].get('summary'),
+                published_at=by_url[url]['published_at'],
+                source_id=by_url[url]['source_id']
+            )
+            for article_id, url in inserted
+        )
+        # Относим новые статьи к сюжетам уже загруженных
+        assign_stories(
+            SimpleNamespace(
+                id=article_id,
+                story_signature=by_url[url]['story_signature'],
+                published_at=by_url[url]['published_at']
+            )
+            for article_id, url in inserted
+        )
+        DataVersion.bump()
+    return inserted
+
+
+def _normalize_rows(rows):
+    """Дедуплицирует по url и выравнивает набор ключей для многострочного VALUES"""
+    unique = {}
+    for row in rows:
+        if row.get('url') and row['url'] not in unique:
+            unique[row['url']] = row
+
+    keys = set()
+    for row in unique.values():
+        keys.update(row)
+    keys.update(('created_at', 'story_signature'))
+
+    now = datetime.utcnow()
+    normalized = []
+    for row in unique.values():
+        item = {key: row.get(key) for key in keys}
+        item['created_at'] = row.get('created_at') or now
+        item['story_signature'] = row.get('story_signature') or story_signature(row.get('title'))
+        normalized.append(item)
+    return normalized
+
+
+def _insert_on_conflict(insert, rows, chunk_size):
+    inserted = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = insert(Article).values(chunk).on_conflict_do_nothing(
+            index_elements=['url']
+        ).returning(Article.id, Article.url)
+        inserted.extend((row.id, row.url) for row in db.session.execute(stmt))
+    return inserted
+
+
+def _insert_one_by_one(rows):
+    """Запасной путь для СУБД без ON CONFLICT: каждая строка в своем savepoint"""
+    inserted = []
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                result = db.session.execute(Article.__table__.insert().values(**row))
+            inserted.append((result.inserted_primary_key[0], row['url']))
+        except IntegrityError:
+            continue
+    return inserted
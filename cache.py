@@ -0,0 +1,84 @@
+# news_aggregator/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш в памяти процесса с ограниченным размером и TTL.
+
+    Считает попадания, промахи и вытеснения; stats() отдает их для мониторинга.
+    """
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+
+# Выжимки /api/news-summary: ключ - (отсортированные id источников, тема, версия данных)
+news_summary_cache = TTLCache(
+    maxsize=Config.NEWS_SUMMARY_CACHE_SIZE,
+    ttl=Config.NEWS_SUMMARY_CACHE_TTL
+)
+
+# Варианты выбора источников для формы настроек: ключ ('choices', версия источников),
+# хранится только последняя версия
+source_choices_cache = TTLCache(maxsize=1, ttl=Config.SOURCE_CHOICES_CACHE_TTL)
+
+
+def invalidate_source_caches():
+    """Сбрасывает кэш списка источников (вызывается после добавления источников)"""
+    source_choices_cache.clear()
+
+
+def invalidate_article_caches():
+    """Сбрасывает кэши, зависящие от набора статей (вызывается после загрузки новостей)"""
+    news_summary_cache.clear()
@@ -2,8 +2,11 @@
 
 import click
 from flask.cli import with_appcontext
-from models import db, User, NewsSource, Article
+from models import db, User, NewsSource, Article, SummaryCache, ArticleTopic, DataVersion
 from news_fetcher import fetch_all_sources, fetch_news_from_sources
+from summary_stage import summarize_pending_articles
+from migrations import upgrade_schema
+from story_clusters import release_stories
 from datetime import datetime, timedelta
 
 
@@ -11,7 +14,7 @@ from datetime import datetime, timedelta
 @with_appcontext
 def init_db():
     """Инициализация базы данных"""
-    db.create_all()
+    upgrade_schema()
     click.echo('База данных инициализирована.')
 
 
@@ -21,7 +24,7 @@ def clear_db():
     """Очистка всех данных из базы данных"""
     if click.confirm('Вы уверены, что хотите очистить всю базу данных?'):
         db.drop_all()
-        db.create_all()
+        upgrade_schema()
         click.echo('База данных очищена.')
 
 
@@ -30,7 +33,9 @@ def clear_db():
 def clear_articles():
     """Очистка только статей"""
     if click.confirm('Удалить все статьи?'):
+        ArticleTopic.query.delete()
         Article.query.delete()
+        DataVersion.bump()
         db.session.commit()
         click.echo('Все статьи удалены.')
 
@@ -45,7 +50,12 @@ def clean_old_articles(days):
     count = old_articles.count()
 
     if count > 0 and click.confirm(f'Удалить {count} статей старше {days} дней?'):
+        # Оценки тем удаляем явно: SQLite не применяет ON DELETE CASCADE по умолчанию
+        ArticleTopic.query.filter(ArticleTopic.published_at < cutoff_date).delete()
+        # ... и по той же причине сами освобождаем дубликаты удаляемых представителей сюжетов
+        release_stories(old_articles.with_entities(Article.id).scalar_subquery())
         old_articles.delete()
+        DataVersion.bump()
         db.session.commit()
         click.echo(f'Удалено {count} старых статей.')
     else:
@@ -62,11 +72,15 @@ def fetch_sources():
 
 @click.command()
 @click.option('--days', default=1, help='Количество дней назад для загрузки')
+@click.option('--summarize-pending', is_flag=True,
+              help='Досчитать сводки статей, оставшихся без них с прошлых запусков')
 @with_appcontext
-def fetch_news(days):
-    """Загрузка новостей"""
+def fetch_news(days, summarize_pending):
+    """Загрузка новостей (сводки новых статей считает сам конвейер загрузки)"""
     count = fetch_news_from_sources(days_back=days)
     click.echo(f'Загружено {count} новых статей.')
+    if summarize_pending:
+        summarize_pending_articles()
 
 
 @click.command()
@@ -121,34 +135,21 @@ def stats():
     click.echo(f'Пользователей: {users_count}')
     click.echo(f'Источников: {sources_count}')
     click.echo(f'Статей: {articles_count}')
+    click.echo(f'Сводок в кэше: {SummaryCache.query.count()}')
 
 
 @click.command()
-@click.option('--hours', default=2, help='Интервал автоматического обновления в часах')
+@click.option('--tick', default=None, type=int,
+              help='Как часто проверять расписание и продлевать лидерство (с)')
 @with_appcontext
-def auto_update_news(hours):
-    """Запуск автоматического обновления новостей"""
-    import time
-    import threading
-
-    def update_loop():
-        while True:
-            try:
-                click.echo(f'🔄 Автоматическое обновление новостей...')
-                count = fetch_news_from_sources(days_back=1)
-                click.echo(f'✅ Загружено {count} новых статей')
-            except Exception as e:
-                click.echo(f'❌ Ошибка обновления: {e}')
-
-            time.sleep(hours * 3600)  # Переводим часы в секунды
-
-    click.echo(f'🚀 Запуск автоматического обновления каждые {hours} ч.')
-    thread = threading.Thread(target=update_loop, daemon=True)
-    thread.start()
+def auto_update_news(tick):
+    """Запуск автоматического обновления новостей по адаптивному расписанию"""
+    from feed_scheduler import run_scheduler
 
+    click.echo('🚀 Запуск планировщика опроса лент')
     try:
-        while True:
-            time.sleep(1)
+        # Аренду лидерства планировщик освобождает и при прерывании
+        run_scheduler(tick=tick)
     except KeyboardInterrupt:
         click.echo('\n⏹️  Автоматическое обновление остановлено')
 
@@ -173,12 +174,113 @@ def clear_users():
 
 
 @click.command()
+@click.option('--sequential', is_flag=True, help='Загружать ленты по очереди, без пула потоков')
+@click.option('--summarize-pending', is_flag=True,
+              help='Досчитать сводки статей, оставшихся без них с прошлых запусков')
 @with_appcontext
-def fetch_rss():
-    """Загрузка новостей из RSS"""
+def fetch_rss(sequential, summarize_pending):
+    """Загрузка новостей из RSS (сводки новых статей считает сам конвейер загрузки)"""
     from rss_fetcher import fetch_rss_sources
-    count = fetch_rss_sources()
+    count = fetch_rss_sources(concurrent=not sequential)
     click.echo(f'Загружено {count} статей из RSS.')
+    if summarize_pending:
+        summarize_pending_articles()
+
+
+@click.command()
+@click.option('--limit', default=None, type=int, help='Максимум статей за запуск')
+@click.option('--workers', default=None, type=int, help='Число процессов суммаризации')
+@with_appcontext
+def summarize_articles(limit, workers):
+    """Заполнение сводок для статей без summary"""
+    count = summarize_pending_articles(limit=limit, workers=workers)
+    click.echo(f'Создано сводок: {count}.')
+
+
+@click.command()
+@with_appcontext
+def nltk_warmup():
+    """Загрузка ресурсов NLTK в локальный каталог и прогрев суммаризатора"""
+    from summarizer import warm_up
+    from config import Config
+    warm_up(allow_download=True)
+    click.echo(f'Ресурсы NLTK готовы ({Config.NLTK_DATA_DIR}).')
+
+
+@click.command()
+@click.option('--batch-size', default=500, help='Сколько статей обрабатывать за один коммит')
+@with_appcontext
+def backfill_topics(batch_size):
+    """Пересчет оценок тем для всех статей"""
+    from topic_index import backfill_topics as run_backfill
+    count = run_backfill(batch_size=batch_size)
+    click.echo(f'Оценки тем пересчитаны для {count} статей.')
+
+
+@click.command()
+@click.option('--batch-size', default=500, help='Сколько статей обрабатывать за один коммит')
+@with_appcontext
+def backfill_stories(batch_size):
+    """Подписи и сюжеты для статей, загруженных до кластеризации"""
+    from story_clusters import backfill_stories as run_backfill
+    count = run_backfill(batch_size=batch_size)
+    click.echo(f'Сюжеты посчитаны для {count} статей.')
+
+
+@click.command()
+@with_appcontext
+def db_upgrade():
+    """Применение непримененных миграций схемы"""
+    applied = upgrade_schema()
+    for version, name in applied:
+        click.echo(f'Применена миграция {version}: {name}')
+    if not applied:
+        click.echo('Схема актуальна, миграций для применения нет.')
+
+
+@click.command()
+@with_appcontext
+def explain_queries():
+    """Планы выполнения горячих запросов (проверка покрытия индексами)"""
+    from query_plans import explain_hot_queries
+    for name, plan in explain_hot_queries():
+        click.echo(f'== {name}')
+        for line in plan:
+            click.echo(f'   {line}')
+        click.echo('')
+
+
+@click.command()
+@with_appcontext
+def feed_schedule():
+    """Таблица расписания опроса лент: частота публикаций и следующий опрос"""
+    from feed_scheduler import sync_schedule, schedule_table
+    sync_schedule()
+    now = datetime.utcnow()
+    click.echo(f'{"Лента":<55} {"статей/ч":>9} {"интервал":>9} {"новых":>6}  следующий опрос')
+    for schedule in schedule_table():
+        rate = f'{schedule.rate:.2f}' if schedule.rate is not None else '-'
+        last_new = schedule.last_new if schedule.last_new is not None else '-'
+        due_in = max(int((schedule.next_run_at - now).total_seconds()), 0)
+        failures = f' (ошибок подряд: {schedule.failures})' if schedule.failures else ''
+        click.echo(f'{schedule.feed_key[:55]:<55} {rate:>9} {schedule.interval // 60:>7} м '
+                   f'{last_new:>6}  через {due_in // 60} м{failures}')
+
+
+@click.command('ingest-worker')
+@click.option('--workers', default=1, help='Число процессов загрузки на этом хосте')
+@click.option('--shard-index', default=0, help='Номер шарда этого хоста (с 0)')
+@click.option('--shard-count', default=1, help='Сколько хостов делят ленты')
+@click.option('--tick', default=None, type=int,
+              help='Как часто проверять расписание и продлевать аренду (с)')
+@with_appcontext
+def ingest_worker(workers, shard_index, shard_count, tick):
+    """Загрузка новостей несколькими процессами, ленты поделены по шардам"""
+    from ingest_worker import run_ingest_workers
+    if workers < 1 or not 0 <= shard_index < shard_count:
+        raise click.BadParameter('нужно workers >= 1 и 0 <= shard-index < shard-count')
+    run_ingest_workers(workers, shard_index, shard_count, tick=tick)
+
 
 # В функции register_commands добавьте:
 def register_commands(app):
@@ -195,4 +297,12 @@ def register_commands(app):
     app.cli.add_command(stats)
     app.cli.add_command(clear_users)
     app.cli.add_command(auto_update_news)
-    app.cli.add_command(fetch_rss)  # Добавить эту строку
\ No newline at end of file
+    app.cli.add_command(fetch_rss)  # Добавить эту строку
+    app.cli.add_command(summarize_articles)
+    app.cli.add_command(nltk_warmup)
+    app.cli.add_command(backfill_topics)
+    app.cli.add_command(backfill_stories)
+    app.cli.add_command(db_upgrade)
+    app.cli.add_command(explain_queries)
+    app.cli.add_command(feed_schedule)
+    app.cli.add_command(ingest_worker)
\ No newline at end of file
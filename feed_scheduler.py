@@ -0,0 +1,316 @@
+# news_aggregator/feed_scheduler.py
+
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from models import db, FeedSchedule, SchedulerLock, NewsSource
+from config import Config
+
+# Ключ расписания для запроса к NewsAPI (все активные источники одним опросом)
+NEWSAPI_FEED_KEY = 'newsapi'
+
+# Аренда планировщика без шардов; аренды шардов ingest-worker - 'ingest:<шард>'
+LEASE_NAME = 'ingest'
+
+
+class LeaderLease:
+    """Аренда лидерства через строку scheduler_lock.
+
+    Захват и продление - один условный UPDATE (свободна, истекла или уже наша),
+    поэтому из нескольких процессов (воркеры gunicorn, CLI) лидером будет
+    только один. Если лидер умер, аренда истечет через ttl секунд.
+    """
+
+    def __init__(self, name=LEASE_NAME, ttl=None, owner=None):
+        self.name = name
+        self.ttl = ttl or Config.SCHEDULER_LEASE_TTL
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self):
+        """Захватывает или продлевает аренду, возвращает True для лидера"""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        updated = SchedulerLock.query.filter(
+            SchedulerLock.name == self.name,
+            db.or_(SchedulerLock.owner == self.owner, SchedulerLock.expires_at < now)
+        ).update({'owner': self.owner, 'expires_at': expires_at}, synchronize_session=False)
+
+        if not updated:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(SchedulerLock(name=self.name, owner=self.owner,
+                                                 expires_at=expires_at))
+            except IntegrityError:
+                # Строка есть и аренда чужая
+                db.session.commit()
+                return False
+
+        db.session.commit()
+        return True
+
+    def release(self):
+        SchedulerLock.query.filter_by(name=self.name, owner=self.owner).update(
+            {'expires_at': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+
+
+def rival_leases(shard=None):
+    """Число живых аренд, с которыми нельзя опрашивать одновременно.
+
+    Планировщик без шардов и воркеры ingest-worker опрашивают одни и те же
+    ленты: первому мешают аренды шардов, вторым - аренда LEASE_NAME.
+    """
+    name = SchedulerLock.name.like(f'{LEASE_NAME}:%') if shard is None \
+        else SchedulerLock.name == LEASE_NAME
+    count = SchedulerLock.query.filter(
+        name, SchedulerLock.expires_at >= datetime.utcnow()
+    ).count()
+    db.session.commit()
+    return count
+
+
+def newsapi_source_ids(shard=None):
+    """source_id активных источников для запроса к NewsAPI (для шарда - только его).
+
+    Шарды делят источники целыми наборами по MAX_SOURCES_PER_REQUEST: число
+    запросов за цикл остается ceil(всего / 20) при любом числе воркеров.
+    Наборы шарда идут подряд в общем порядке, поэтому chunked() собирает
+    из его списка те же наборы.
+    """
+    from newsapi_client import chunked
+
+    rows = db.session.query(NewsSource.source_id).filter(
+        NewsSource.is_active.is_(True)
+    ).order_by(NewsSource.source_id)
+    source_ids = [row.source_id for row in rows]
+    if shard is None:
+        return source_ids
+    return [
+        source_id
+        for chunk in chunked(source_ids) if shard.owns(','.join(chunk))
+        for source_id in chunk
+    ]
+
+
+def scheduled_feeds(shard=None):
+    """Ленты, которые опрашивает планировщик (или шард воркера): (ключ, вид).
+
+    У шарда свой ключ NewsAPI: он запрашивает только свои источники.
+    """
+    from rss_fetcher import rss_feed_urls
+    feeds = [(url, 'rss') for url in rss_feed_urls() if shard is None or shard.owns(url)]
+    if shard is None:
+        feeds.append((NEWSAPI_FEED_KEY, 'newsapi'))
+    elif newsapi_source_ids(shard):
+        feeds.append((f'{NEWSAPI_FEED_KEY}:{shard.label}', 'newsapi'))
+    return feeds
+
+
+def sync_schedule(now=None, shard=None):
+    """Добавляет в расписание новые ленты (к опросу сразу).
+
+    Возвращает ключ -> FeedSchedule для лент планировщика (шарда).
+    """
+    now = now or datetime.utcnow()
+    feeds = scheduled_feeds(shard)
+    keys = [key for key, _ in feeds]
+    schedules = {
+        schedule.feed_key: schedule
+        for schedule in FeedSchedule.query.filter(FeedSchedule.feed_key.in_(keys))
+    }
+    for key, kind in feeds:
+        if key not in schedules:
+            schedules[key] = FeedSchedule(
+                feed_key=key, kind=kind, interval=Config.SCHEDULER_DEFAULT_INTERVAL,
+                next_run_at=now
+            )
+            db.session.add(schedules[key])
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Ту же ленту одновременно добавил другой процесс - берем его запись
+        db.session.rollback()
+        return {
+            schedule.feed_key: schedule
+            for schedule in FeedSchedule.query.filter(FeedSchedule.feed_key.in_(keys))
+        }
+    return schedules
+
+
+def next_interval(rate):
+    """Интервал опроса (с), при котором за опрос приходит около SCHEDULER_TARGET_NEW статей"""
+    if not rate:
+        return Config.SCHEDULER_MAX_INTERVAL
+    interval = Config.SCHEDULER_TARGET_NEW / rate * 3600
+    return int(min(max(interval, Config.SCHEDULER_MIN_INTERVAL), Config.SCHEDULER_MAX_INTERVAL))
+
+
+def record_poll(schedule, new_count, now=None):
+    """Обновляет оценку частоты и время следующего опроса после опроса ленты.
+
+    new_count - число новых статей или None при ошибке (тогда интервал
+    удваивается с каждой ошибкой подряд, до SCHEDULER_MAX_INTERVAL).
+    """
+    now = now or datetime.utcnow()
+
+    if new_count is None:
+        schedule.failures += 1
+        backoff = schedule.interval * 2 ** schedule.failures
+        schedule.next_run_at = now + timedelta(seconds=min(backoff, Config.SCHEDULER_MAX_INTERVAL))
+        return schedule
+
+    if schedule.last_run_at is not None:
+        # Первый опрос отдает накопленный хвост ленты - частоту по нему не оцениваем
+        hours = max((now - schedule.last_run_at).total_seconds(), 60) / 3600
+        observed = new_count / hours
+        alpha = Config.SCHEDULER_RATE_ALPHA
+        schedule.rate = observed if schedule.rate is None else \
+            alpha * observed + (1 - alpha) * schedule.rate
+        schedule.interval = next_interval(schedule.rate)
+
+    schedule.failures = 0
+    schedule.last_new = new_count
+    schedule.last_run_at = now
+    schedule.next_run_at = now + timedelta(seconds=schedule.interval)
+    return schedule
+
+
+def run_due_feeds(now=None, shard=None, lease=None):
+    """Опрашивает ленты (шарда), чье время подошло.
+
+    С lease аренда продлевается между опросами: после RSS (их общий цикл
+    ограничен RSS_CYCLE_DEADLINE) и перед каждым запросом к NewsAPI. Если
+    аренду перехватили, цикл прерывается - неопрошенные ленты остаются
+    к опросу у нового лидера. Ленты с ошибкой считаются по заданиям: лента
+    RSS или один набор источников NewsAPI.
+    Возвращает (число опрошенных лент, новых статей, лент с ошибкой).
+    """
+    from ingest_pipeline import ArticleWriter
+    from rss_fetcher import fetch_rss_sources
+    from news_fetcher import fetch_news_from_sources
+    from newsapi_client import chunked
+
+    now = now or datetime.utcnow()
+    due = [
+        schedule for schedule in sync_schedule(now, shard).values()
+        if schedule.next_run_at <= now
+    ]
+    if not due:
+        return 0, 0, 0
+
+    writer = ArticleWriter()
+    failed = 0
+    polled = 0
+    rss = [schedule for schedule in due if schedule.kind == 'rss']
+    if rss:
+        try:
+            fetch_rss_sources(urls={schedule.feed_key for schedule in rss}, writer=writer)
+        except Exception as e:
+            print(f"❌ Планировщик, RSS: {e}")
+        for schedule in rss:
+            new_count = writer.by_feed.get(schedule.feed_key)
+            failed += new_count is None
+            record_poll(schedule, new_count, now)
+        polled += len(rss)
+        # Коммитим до следующего конвейера: его запись идет из другой сессии
+        db.session.commit()
+
+    for schedule in due:
+        if schedule.kind != 'newsapi':
+            continue
+        if lease is not None and not lease.acquire():
+            print(f"⚠️  Аренда {lease.name} перехвачена - прерываем цикл")
+            break
+        source_ids = newsapi_source_ids(shard)
+        api_writer = ArticleWriter()
+        if source_ids:
+            try:
+                fetch_news_from_sources(source_ids=source_ids, days_back=1, writer=api_writer)
+            except Exception as e:
+                print(f"❌ Планировщик, NewsAPI: {e}")
+        # Задание конвейера - набор источников; записанные попадают в by_feed
+        failed += len(chunked(source_ids)) - len(api_writer.by_feed)
+        succeeded = api_writer.by_feed or not source_ids
+        record_poll(schedule, api_writer.inserted if succeeded else None, now)
+        writer.inserted += api_writer.inserted
+        polled += 1
+
+    db.session.commit()
+    print(f"🗓️  Опрошено лент: {polled}, новых статей: {writer.inserted}, с ошибкой: {failed}")
+    return polled, writer.inserted, failed
+
+
+def schedule_table():
+    """Таблица расписания, отсортированная по времени следующего опроса"""
+    return FeedSchedule.query.order_by(FeedSchedule.next_run_at, FeedSchedule.feed_key).all()
+
+
+def seconds_until_next_run(now=None, shard=None):
+    now = now or datetime.utcnow()
+    keys = [key for key, _ in scheduled_feeds(shard)]
+    next_run_at = db.session.query(db.func.min(FeedSchedule.next_run_at)).filter(
+        FeedSchedule.feed_key.in_(keys)
+    ).scalar()
+    if next_run_at is None:
+        return 0
+    return max((next_run_at - now).total_seconds(), 0)
+
+
+def run_scheduler(stop_event=None, tick=None, shard=None):
+    """Цикл планировщика: лидер опрашивает подошедшие ленты, остальные ждут.
+
+    Просыпается к ближайшему опросу, но не реже tick секунд - чтобы продлевать
+    аренду и подхватить лидерство, если прежний лидер пропал. С shard
+    опрашивает только ленты шарда под арендой этого шарда. Воркеры шардов
+    главнее: пока живы их аренды, планировщик без шардов отдает аренду и
+    ждет, а воркеры не начинают, пока она не освободится. Останавливается
+    после текущего цикла, когда выставлен stop_event; возвращает метрики.
+    """
+    stop_event = stop_event or threading.Event()
+    tick = tick or Config.SCHEDULER_TICK
+    lease = LeaderLease(name=f'{LEASE_NAME}:{shard.label}' if shard else LEASE_NAME)
+    metrics = {'cycles': 0, 'feeds': 0, 'articles': 0, 'failed_feeds': 0,
+               'errors': 0, 'busy_seconds': 0.0}
+    print(f"🗓️  Планировщик запущен ({lease.name}, {lease.owner})")
+    yielded = False
+
+    try:
+        while not stop_event.is_set():
+            wait = tick
+            try:
+                if lease.acquire():
+                    if rival_leases(shard):
+                        if not yielded:
+                            print(f"ℹ️  {lease.name}: ленты опрашивает другой планировщик, ждем")
+                        yielded = True
+                        if shard is None:
+                            lease.release()
+                    else:
+                        yielded = False
+                        started = time.monotonic()
+                        feeds, articles, failed = run_due_feeds(shard=shard, lease=lease)
+                        if feeds:
+                            metrics['cycles'] += 1
+                            metrics['feeds'] += feeds
+                            metrics['articles'] += articles
+                            metrics['failed_feeds'] += failed
+                            metrics['busy_seconds'] += time.monotonic() - started
+                        lease.acquire()
+                        wait = min(tick, seconds_until_next_run(shard=shard))
+            except Exception as e:
+                metrics['errors'] += 1
+                print(f"❌ Ошибка планировщика: {e}")
+                db.session.rollback()
+            stop_event.wait(max(wait, 1))
+    finally:
+        try:
+            lease.release()
+        except Exception:
+            db.session.rollback()
+    print(f"⏹️  Планировщик остановлен ({lease.name})")
+    return metrics
@@ -4,7 +4,8 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, SelectMultipleField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
 from wtforms.widgets import CheckboxInput, ListWidget
-from models import User, NewsSource
+from models import User, NewsSource, DataVersion
+from cache import source_choices_cache
 
 class MultiCheckboxField(SelectMultipleField):
     widget = ListWidget(prefix_label=False)
@@ -36,11 +37,26 @@ class RegistrationForm(FlaskForm):
         if user is not None:
             raise ValidationError('Пользователь с таким email уже существует.')
 
+def active_source_choices():
+    """Список (id, name) активных источников, кэшируется на SOURCE_CHOICES_CACHE_TTL.
+
+    Ключ кэша включает версию 'sources': источник, созданный в другом процессе
+    (загрузчик, планировщик), сразу попадает в форму всех веб-воркеров.
+    """
+    cache_key = ('choices', DataVersion.current('sources'))
+    choices = source_choices_cache.get(cache_key)
+    if choices is None:
+        rows = NewsSource.query.with_entities(
+            NewsSource.id, NewsSource.name
+        ).filter_by(is_active=True).order_by(NewsSource.id).all()
+        choices = [(row.id, row.name) for row in rows]
+        source_choices_cache.set(cache_key, choices)
+    return choices
+
 class SourceSelectionForm(FlaskForm):
     sources = MultiCheckboxField('Источники новостей', coerce=int)
     submit = SubmitField('Сохранить настройки')
 
     def __init__(self, *args, **kwargs):
         super(SourceSelectionForm, self).__init__(*args, **kwargs)
-        self.sources.choices = [(source.id, source.name)
-                               for source in NewsSource.query.filter_by(is_active=True).all()]
\ No newline at end of file
+        self.sources.choices = active_source_choices()
\ No newline at end of file
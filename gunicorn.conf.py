@@ -0,0 +1,11 @@
+# news_aggregator/gunicorn.conf.py
+# gunicorn подхватывает этот файл автоматически из рабочего каталога
+
+
+def on_starting(server):
+    """Готовим токенизатор NLTK в мастер-процессе до fork воркеров"""
+    try:
+        from summarizer import warm_up
+        warm_up()
+    except Exception as e:
+        server.log.warning(f"NLTK warm-up failed: {e}")
@@ -0,0 +1,283 @@
+# news_aggregator/ingest_pipeline.py
+
+import queue
+import threading
+import time
+from flask import current_app, has_app_context
+from config import Config
+
+# Маркер конца потока элементов между стадиями
+_DONE = object()
+
+
+class StageStats:
+    """Счетчики одной стадии: принято, выдано, ошибок, суммарное время работы"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.received = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, received=0, emitted=0, errors=0, busy=0.0):
+        with self._lock:
+            self.received += received
+            self.emitted += emitted
+            self.errors += errors
+            self.busy += busy
+
+    def as_dict(self):
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'received': self.received,
+            'emitted': self.emitted,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy, 3)
+        }
+
+
+class Stage:
+    """Стадия конвейера: func(item) возвращает итерируемое выходных элементов.
+
+    workers - число потоков стадии. Ошибка на элементе считается и логируется,
+    элемент отбрасывается, остальные продолжают обработку.
+    """
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+    def process(self, item):
+        return self.func(item) or ()
+
+
+class BatchStage(Stage):
+    """Стадия, обрабатывающая элементы пачками: func(items) вызывается, когда
+    накопилось batch_size единиц (size(item) на элемент), и в конце потока."""
+
+    def __init__(self, name, func, batch_size, size=None):
+        super().__init__(name, func, workers=1)
+        self.batch_size = batch_size
+        self.size = size or (lambda item: 1)
+
+
+class Pipeline:
+    """Стадии, соединенные ограниченными очередями.
+
+    Каждая стадия работает в своих потоках; когда очередь следующей стадии
+    заполнена, put блокируется - быстрые стадии ждут медленные, и в памяти
+    одновременно не больше queue_size элементов на стадию. Потоки с доступом
+    к БД получают собственный контекст приложения (и свою сессию).
+    """
+
+    def __init__(self, stages, queue_size=None):
+        self.stages = stages
+        self.queue_size = queue_size or Config.INGEST_QUEUE_SIZE
+        self.stats = [StageStats(stage.name, stage.workers) for stage in stages]
+
+    def run(self, items):
+        """Прогоняет items через стадии, возвращает выход последней стадии"""
+        app = current_app._get_current_object() if has_app_context() else None
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results = []
+        results_lock = threading.Lock()
+        remaining = [stage.workers for stage in self.stages]
+        remaining_lock = threading.Lock()
+
+        def emit(index, output):
+            if index + 1 < len(self.stages):
+                queues[index + 1].put(output)
+            else:
+                with results_lock:
+                    results.append(output)
+
+        def finish(index):
+            # Последний поток стадии закрывает вход следующей
+            with remaining_lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    queues[index + 1].put(_DONE)
+
+        def call(index, payload):
+            stage, stats = self.stages[index], self.stats[index]
+            started = time.monotonic()
+            try:
+                outputs = list(stage.process(payload))
+            except Exception as e:
+                stats.record(errors=1, busy=time.monotonic() - started)
+                print(f"❌ Конвейер, стадия {stage.name}: {e}")
+                return
+            stats.record(emitted=len(outputs), busy=time.monotonic() - started)
+            for output in outputs:
+                emit(index, output)
+
+        def work(index):
+            stage, stats = self.stages[index], self.stats[index]
+            batch, batch_size = [], 0
+            while True:
+                item = queues[index].get()
+                if item is _DONE:
+                    break
+                stats.record(received=1)
+                if not isinstance(stage, BatchStage):
+                    call(index, item)
+                    continue
+                batch.append(item)
+                batch_size += stage.size(item)
+                if batch_size >= stage.batch_size:
+                    call(index, batch)
+                    batch, batch_size = [], 0
+            if batch:
+                call(index, batch)
+            finish(index)
+
+        def run_worker(index):
+            if app is None:
+                return work(index)
+            with app.app_context():
+                return work(index)
+
+        threads = [
+            threading.Thread(
+                target=run_worker, args=(index,), daemon=True,
+                name=f"ingest-{stage.name}-{worker}"
+            )
+            for index, stage in enumerate(self.stages)
+            for worker in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Источник тоже упирается в ограниченную очередь первой стадии
+        for item in items:
+            queues[0].put(item)
+        for _ in range(self.stages[0].workers):
+            queues[0].put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(self, title):
+        print(f"📊 {title}:")
+        for stats in self.stats:
+            print(f"   {stats.name:<10} x{stats.workers}: принято {stats.received}, "
+                  f"выдано {stats.emitted}, ошибок {stats.errors}, {stats.busy:.2f} с")
+
+
+class IngestJob:
+    """Единица работы конвейера загрузки: одна лента (или один запрос к API).
+
+    key - ключ FeedState для условных запросов, rows - строки статей после
+    нормализации. Валидаторы сохраняются стадией записи вместе с ее коммитом.
+    """
+
+    def __init__(self, key, name, url=None, state=None, **extra):
+        self.key = key
+        self.name = name
+        self.url = url
+        self.state = state
+        self.not_modified = False
+        self.etag = None
+        self.last_modified = None
+        self.content_hash = None
+        self.payload = None
+        self.rows = []
+        self.__dict__.update(extra)
+
+
+def dedup_stage(workers=1):
+    """Отбрасывает строки, чьи URL уже есть в БД или уже прошли в этом запуске"""
+    from article_store import find_existing_urls
+
+    seen = set()
+    seen_lock = threading.Lock()
+
+    def dedup(job):
+        if job.rows:
+            existing = find_existing_urls(row['url'] for row in job.rows)
+            unique = []
+            with seen_lock:
+                for row in job.rows:
+                    if row['url'] in existing or row['url'] in seen:
+                        continue
+                    seen.add(row['url'])
+                    unique.append(row)
+            job.rows = unique
+        yield job
+
+    return Stage('dedup', dedup, workers)
+
+
+class ArticleWriter:
+    """Стадия пакетной записи: статьи нескольких лент одной вставкой и одним
+    коммитом вместе с их валидаторами. Ошибка откатывает только свою пачку."""
+
+    def __init__(self):
+        self.inserted = 0
+        # Число новых статей по ключу ленты - для успешно записанных лент
+        self.by_feed = {}
+
+    def __call__(self, jobs):
+        from models import db, FeedState
+        from article_store import insert_articles
+        from cache import invalidate_article_caches
+
+        rows = [row for job in jobs for row in job.rows]
+        owners = {row['url']: job.key for job in jobs for row in job.rows}
+        try:
+            inserted = insert_articles(rows) if rows else []
+            for job in jobs:
+                FeedState.remember(
+                    job.key, job.etag, job.last_modified, job.content_hash,
+                    changed=not job.not_modified, state=_merged_state(db, job)
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if inserted:
+            # После коммита: иначе параллельный запрос снова заполнил бы кэш старыми данными
+            invalidate_article_caches()
+
+        self.inserted += len(inserted)
+        for job in jobs:
+            self.by_feed.setdefault(job.key, 0)
+        for _, url in inserted:
+            self.by_feed[owners[url]] += 1
+        for job in jobs:
+            if job.not_modified:
+                print(f"ℹ️  {job.name}: лента не изменилась")
+        print(f"✅ Записано {len(inserted)} новых статей из {len(jobs)} лент")
+        if inserted:
+            yield [article_id for article_id, _ in inserted]
+
+
+def _merged_state(db, job):
+    # Состояние загружено в сессии другого потока - переносим его в свою
+    return db.session.merge(job.state, load=False) if job.state is not None else None
+
+
+def write_stage(writer, batch_size=None):
+    return BatchStage(
+        'write', writer,
+        batch_size=batch_size or Config.INGEST_BATCH_SIZE,
+        size=lambda job: max(1, len(job.rows))
+    )
+
+
+def summarize_stage():
+    """Сводки для только что записанных статей - после коммита их пачки"""
+    from summary_stage import summarize_pending_articles
+
+    def summarize(article_ids):
+        yield summarize_pending_articles(ids=article_ids)
+
+    return Stage('summarize', summarize)
@@ -0,0 +1,140 @@
+# news_aggregator/ingest_worker.py
+
+import hashlib
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from config import Config
+
+
+class Shard:
+    """Доля лент одного процесса-воркера.
+
+    Ключ ленты (URL RSS или source_id источника NewsAPI) хэшируется стабильно
+    между процессами и хостами: сначала делится между хостами (host_index из
+    host_count), затем между воркерами хоста. Доли не пересекаются, поэтому
+    каждую ленту опрашивает ровно один воркер.
+    """
+
+    def __init__(self, host_index=0, host_count=1, worker_index=0, worker_count=1):
+        if not 0 <= host_index < host_count:
+            raise ValueError(f"номер шарда {host_index} вне диапазона 0..{host_count - 1}")
+        self.host_index = host_index
+        self.host_count = host_count
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+
+    @property
+    def label(self):
+        return f"{self.host_index}of{self.host_count}-w{self.worker_index}of{self.worker_count}"
+
+    def owns(self, key):
+        value = int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big')
+        return value % self.host_count == self.host_index and \
+            (value // self.host_count) % self.worker_count == self.worker_index
+
+
+def _worker_main(shard, stop_event, results, tick):
+    """Точка входа процесса-воркера: свое приложение, свое подключение к БД"""
+    # Сигналы получает вся группа процессов - останавливает воркеров родитель
+    # через stop_event, чтобы текущий цикл успел записаться
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    from app import app
+    _run_shard(app, shard, stop_event, results, tick)
+
+
+def _run_shard(app, shard, stop_event, results, tick):
+    from feed_scheduler import run_scheduler
+    from newsapi_client import share_budget
+
+    # Все воркеры всех хостов ходят в NewsAPI с одним ключом
+    share_budget(shard.host_count * shard.worker_count)
+    with app.app_context():
+        metrics = run_scheduler(stop_event, tick=tick, shard=shard)
+    results.put((shard.label, metrics))
+
+
+def print_metrics(results):
+    print("📊 Метрики воркеров:")
+    for label, metrics in sorted(results):
+        print(f"   {label}: циклов {metrics['cycles']}, лент {metrics['feeds']}, "
+              f"статей {metrics['articles']}, лент с ошибкой {metrics['failed_feeds']}, "
+              f"ошибок {metrics['errors']}, {metrics['busy_seconds']:.1f} с")
+
+
+def run_ingest_workers(workers=1, host_index=0, host_count=1, tick=None, grace=None):
+    """Запускает workers процессов загрузки для шарда host_index из host_count.
+
+    SIGINT/SIGTERM останавливают воркеров после текущего цикла; не успевшие
+    за grace секунд завершаются принудительно. Возвращает метрики воркеров.
+    Вызывается в контексте приложения.
+    """
+    from flask import current_app
+
+    from rss_fetcher import ensure_rss_sources
+
+    grace = grace or Config.INGEST_SHUTDOWN_GRACE
+    shards = [Shard(host_index, host_count, index, workers) for index in range(workers)]
+    # Источники RSS создаем до запуска: иначе воркеры наперегонки вставляли бы те же строки
+    ensure_rss_sources()
+
+    if workers == 1:
+        # Один воркер - поток текущего процесса, без лишнего подключения к БД
+        stop_event = threading.Event()
+        results = queue.Queue()
+        app = current_app._get_current_object()
+        runners = [threading.Thread(target=_run_shard, daemon=True, name='ingest',
+                                    args=(app, shards[0], stop_event, results, tick))]
+    else:
+        # spawn: у каждого процесса свой пул соединений, без унаследованных сокетов
+        context = multiprocessing.get_context('spawn')
+        stop_event = context.Event()
+        results = context.Queue()
+        runners = [
+            context.Process(target=_worker_main, args=(shard, stop_event, results, tick),
+                            name=f"ingest-{shard.label}")
+            for shard in shards
+        ]
+
+    # Обработчик только поднимает флаг: Event.set из обработчика сигнала может
+    # навсегда заблокироваться на замке, который держит прерванный wait
+    requested = []
+    previous = {
+        signum: signal.signal(signum, lambda signum, frame: requested.append(signum))
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    try:
+        for runner in runners:
+            runner.start()
+        print(f"🚀 Запущено воркеров: {workers} (шард {host_index} из {host_count})")
+
+        while any(runner.is_alive() for runner in runners) and not requested:
+            time.sleep(0.5)
+
+        print("⏹️  Останавливаем воркеров...")
+        stop_event.set()
+        deadline = time.monotonic() + grace
+        collected = []
+        while len(collected) < len(runners) and time.monotonic() < deadline:
+            try:
+                collected.append(results.get(timeout=1))
+            except queue.Empty:
+                if not any(runner.is_alive() for runner in runners):
+                    break
+        for runner in runners:
+            runner.join(timeout=max(deadline - time.monotonic(), 0))
+            if runner.is_alive():
+                print(f"⚠️  {runner.name} не остановился за {grace} с")
+                if isinstance(runner, multiprocessing.process.BaseProcess):
+                    runner.kill()
+                    runner.join()
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+    print_metrics(collected)
+    return collected
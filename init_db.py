@@ -5,9 +5,12 @@ import time
 import sys
 import os
 from app import app, db
-from models import User, NewsSource, Article, user_sources, user_favorites
+from models import User, NewsSource, Article, ArticleTopic, DataVersion, user_sources, user_favorites
 from rss_fetcher import fetch_rss_sources
 from news_fetcher import fetch_all_sources, fetch_news_from_sources
+from summary_stage import summarize_pending_articles
+from migrations import upgrade_schema
+from story_clusters import release_stories
 
 
 def wait_for_db():
@@ -64,6 +67,16 @@ def cleanup_meduza():
                 )
                 db.session.execute(delete_stmt)
 
+            # Дубликаты сюжетов удаляемых статей становятся самостоятельными
+            article_ids = [article.id for article in meduza_articles]
+            release_stories(article_ids)
+
+            # Оценки тем удаляем явно: SQLite без PRAGMA foreign_keys не
+            # выполняет ON DELETE CASCADE
+            ArticleTopic.query.filter(
+                ArticleTopic.article_id.in_(article_ids)
+            ).delete(synchronize_session=False)
+
             # Удаляем все статьи Meduza
             Article.query.filter_by(source_id=meduza_source.id).delete()
 
@@ -75,6 +88,7 @@ def cleanup_meduza():
 
             # Удаляем сам источник
             db.session.delete(meduza_source)
+            DataVersion.bump('sources')
 
             db.session.commit()
             print(f"✅ Removed Meduza source and {len(meduza_articles)} articles")
@@ -90,10 +104,20 @@ def initialize_database():
         print("❌ Database not available")
         sys.exit(1)
 
+    # Готовим токенизатор NLTK заранее, до запуска веб-воркеров
+    try:
+        from summarizer import warm_up
+        warm_up()
+    except Exception as e:
+        print(f"⚠️ NLTK warm-up failed (summaries will fall back to descriptions): {e}")
+
     with app.app_context():
         if is_db_initialized():
             print("✅ Database already initialized - skipping full init")
 
+            # Схему обновляем до любых ORM-запросов: модели уже ждут новых колонок
+            upgrade_schema()
+
             # УДАЛЯЕМ MEDUZA ПЕРЕД ОБНОВЛЕНИЕМ НОВОСТЕЙ
             cleanup_meduza()
 
@@ -112,12 +136,17 @@ def initialize_database():
                 print(f"📰 NewsAPI: added {api_count} articles")
             except Exception as e:
                 print(f"⚠️ NewsAPI update failed (not critical): {e}")
+
+            try:
+                summarize_pending_articles()
+            except Exception as e:
+                print(f"⚠️ Summarization failed: {e}")
         else:
             print("🆕 First run detected - full initialization...")
 
             # Создаем таблицы
             print("📊 Creating database tables...")
-            db.create_all()
+            upgrade_schema()
             print("✅ Tables created")
 
             # Загружаем RSS новости
@@ -144,6 +173,14 @@ def initialize_database():
             except Exception as e:
                 print(f"⚠️ NewsAPI news failed: {e}")
 
+            # Сводки считаем после сохранения статей
+            print("📝 Summarizing articles...")
+            try:
+                summary_count = summarize_pending_articles()
+                print(f"✅ Summaries: {summary_count}")
+            except Exception as e:
+                print(f"⚠️ Summarization failed: {e}")
+
             print("🎉 Initialization complete!")
 
 
@@ -0,0 +1,136 @@
+# news_aggregator/keyword_matcher.py
+
+from collections import deque
+
+
+class KeywordMatcher:
+    """Автомат Ахо-Корасик: счетчики всех ключевых слов за один проход по тексту.
+
+    count(text) возвращает {keyword: n} с той же семантикой, что text.count(keyword)
+    для каждого слова по отдельности (непересекающиеся вхождения слева направо),
+    поэтому может заменять циклы вида sum(text.count(k) for k in keywords).
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        self._lengths = [len(k) for k in self.keywords]
+
+        # Бор: переходы, суффиксные ссылки, номера слов, оканчивающихся в узле
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] = self._out[state] + (index,)
+
+        # Суффиксные ссылки обходом в ширину; выходы наследуются по ним
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+        # Полная таблица переходов достраивается лениво (кэш по состоянию)
+        self._delta = [dict(transitions) for transitions in self._goto]
+        self._alphabet = frozenset(char for keyword in self.keywords for char in keyword)
+
+    def _step(self, state, char):
+        if char in self._goto[state]:
+            return self._goto[state][char]
+        if state == 0:
+            return 0
+        return self._step(self._fail[state], char)
+
+    def count(self, text):
+        """Возвращает {keyword: число вхождений} для слов, встретившихся в text"""
+        delta = self._delta
+        out = self._out
+        alphabet = self._alphabet
+        lengths = self._lengths
+
+        counts = {}
+        last_end = {}
+        state = 0
+
+        for position, char in enumerate(text):
+            if char not in alphabet:
+                state = 0
+                continue
+
+            next_state = delta[state].get(char)
+            if next_state is None:
+                next_state = self._step(state, char)
+                delta[state][char] = next_state
+            state = next_state
+
+            for index in out[state]:
+                # Как str.count: вхождение не должно перекрывать предыдущее того же слова
+                if position - lengths[index] >= last_end.get(index, -1):
+                    counts[index] = counts.get(index, 0) + 1
+                    last_end[index] = position
+
+        return {self.keywords[index]: n for index, n in counts.items()}
+
+    def total(self, text, keywords):
+        """Сумма вхождений заданных слов: аналог sum(text.count(k) for k in keywords)"""
+        counts = self.count(text)
+        return sum(counts.get(keyword, 0) for keyword in keywords)
+
+
+def benchmark(repeat=2000):
+    """Сравнение с циклами str.count на наборах ключевых слов summary_generator"""
+    import timeit
+    from summary_generator import KEYWORD_TABLES, KEYWORD_MATCHER
+
+    texts = [
+        "Президент России Владимир Путин заявил, что правительство подготовит указ "
+        "о поддержке экономики. Рубль вырос на бирже, нефть и газ подорожали.",
+        "Сборная по футболу выиграла матч чемпионата, тренер команды отметил игру "
+        "спортсменов. Болельщики устроили праздник после победы в турнире.",
+        "На складе в Подмосковье произошел пожар, МЧС сообщило об эвакуации. "
+        "Следствие возбудило дело, пострадавших нет. " * 3,
+    ]
+    all_keywords = [keyword for table in KEYWORD_TABLES for keyword in table]
+
+    def loops():
+        for text in texts:
+            for table in KEYWORD_TABLES:
+                sum(text.count(keyword) for keyword in table)
+
+    def automaton():
+        for text in texts:
+            counts = KEYWORD_MATCHER.count(text)
+            for table in KEYWORD_TABLES:
+                sum(counts.get(keyword, 0) for keyword in table)
+
+    for text in texts:
+        counts = KEYWORD_MATCHER.count(text)
+        assert all(counts.get(k, 0) == text.count(k) for k in all_keywords)
+
+    loops_time = timeit.timeit(loops, number=repeat)
+    automaton_time = timeit.timeit(automaton, number=repeat)
+    print(f"Ключевых слов: {len(KEYWORD_MATCHER.keywords)}, таблиц: {len(KEYWORD_TABLES)}, "
+          f"текстов: {len(texts)} x {repeat}")
+    print(f"str.count:      {loops_time * 1000:.1f} мс")
+    print(f"Ахо-Корасик:    {automaton_time * 1000:.1f} мс "
+          f"({loops_time / automaton_time:.2f}x)")
+
+
+if __name__ == '__main__':
+    benchmark()
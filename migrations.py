@@ -0,0 +1,155 @@
+# news_aggregator/migrations.py
+
+from sqlalchemy import text, inspect
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from models import db, Article, SchemaVersion
+from search import ensure_search_index
+from topic_index import backfill_topics
+from story_clusters import backfill_stories
+
+# Упорядоченный список миграций: (версия, название, функция)
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Регистрирует функцию как миграцию схемы с номером version.
+
+    Миграция выполняется один раз (факт записывается в schema_version) и
+    должна быть идемпотентной: IF NOT EXISTS и т.п., так как две копии
+    приложения могут стартовать одновременно.
+    """
+    def decorator(func):
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return func
+    return decorator
+
+
+@migration(1, 'search_index')
+def _search_index():
+    ensure_search_index()
+
+
+# Индексы под форму горячих запросов:
+# лента - фильтр по source_id, сортировка (has_image, published_at, id);
+# выжимка - фильтр по source_id, сортировка по published_at;
+# clean_old_articles - фильтр по published_at;
+# выборка пачек без сводки; обратные поиски по таблицам связей
+HOT_PATH_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_article_feed "
+    "ON article ((url_to_image IS NOT NULL), published_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_article_source_feed "
+    "ON article (source_id, (url_to_image IS NOT NULL), published_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_article_source_published "
+    "ON article (source_id, published_at)",
+    "CREATE INDEX IF NOT EXISTS ix_article_published_at "
+    "ON article (published_at)",
+    "CREATE INDEX IF NOT EXISTS ix_article_summary_pending "
+    "ON article (id) WHERE summary IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_user_favorites_article_id "
+    "ON user_favorites (article_id)",
+    "CREATE INDEX IF NOT EXISTS ix_user_sources_source_id "
+    "ON user_sources (source_id)",
+]
+
+
+@migration(2, 'hot_path_indexes')
+def _hot_path_indexes():
+    for ddl in HOT_PATH_INDEXES:
+        db.session.execute(text(ddl))
+    db.session.commit()
+
+
+def _columns(table):
+    return {column['name'] for column in inspect(db.engine).get_columns(table)}
+
+
+def _add_column(table, column, ddl):
+    """ALTER TABLE ... ADD COLUMN, если колонки еще нет.
+
+    Две копии приложения, стартующие одновременно, обе видят колонку
+    отсутствующей, и ALTER второй падает на дубликате: ошибку проглатываем,
+    если после отката колонка существует. Каждый ALTER коммитится сразу, чтобы
+    inspect (отдельное соединение) не ждал блокировку нашей же транзакции.
+    """
+    if column in _columns(table):
+        return
+    try:
+        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        db.session.commit()
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        if column not in _columns(table):
+            raise
+        print(f"ℹ️  Колонку {table}.{column} уже добавил другой процесс")
+
+
+@migration(3, 'story_clusters')
+def _story_clusters():
+    # Для новых БД колонки уже создал create_all, для старых - добавляем
+    blob = Article.__table__.c.story_signature.type.compile(dialect=db.engine.dialect)
+    _add_column('article', 'story_signature', blob)
+    _add_column('article', 'story_id', "INTEGER REFERENCES article (id) ON DELETE SET NULL")
+    # Частичные индексы: дубликаты по представителю и представители в порядке ленты
+    # (полный индекс по story_id планировщик выбирал бы для story_id IS NULL)
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_article_story_id "
+        "ON article (story_id) WHERE story_id IS NOT NULL"
+    ))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_article_feed_stories "
+        "ON article ((url_to_image IS NOT NULL), published_at, id) WHERE story_id IS NULL"
+    ))
+    db.session.commit()
+
+
+# Миграция данных: подписи и сюжеты статей, загруженных до кластеризации.
+# Пересчет идемпотентен (берет только статьи без подписи); flask
+# backfill-stories повторяет его вручную
+@migration(4, 'story_backfill')
+def _story_backfill():
+    backfill_stories()
+
+
+# Миграция данных: оценки тем статей, загруженных до индекса тем. Пересчет
+# идемпотентен; flask backfill-topics повторяет его вручную (например,
+# после правки словарей тем)
+@migration(5, 'topic_backfill')
+def _topic_backfill():
+    count = backfill_topics()
+    print(f"🏷️  Оценки тем посчитаны для {count} статей")
+
+
+def applied_versions():
+    return {row.version for row in db.session.query(SchemaVersion.version)}
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+
+def upgrade_schema():
+    """Создает недостающие таблицы и применяет непримененные миграции по порядку.
+
+    Возвращает список примененных сейчас миграций (версия, название).
+    """
+    db.create_all()
+
+    applied = applied_versions()
+    done = []
+    for version, name, apply in MIGRATIONS:
+        if version in applied:
+            continue
+
+        print(f"🔧 Миграция {version}: {name}")
+        apply()
+        try:
+            db.session.add(SchemaVersion(version=version, name=name))
+            db.session.commit()
+        except IntegrityError:
+            # Ту же миграцию параллельно применил другой процесс
+            db.session.rollback()
+        done.append((version, name))
+
+    return done
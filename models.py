@@ -1,7 +1,9 @@
 # news_aggregator/models.py
 
 from flask_sqlalchemy import SQLAlchemy
+from flask import g, has_request_context
 from flask_login import UserMixin
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
@@ -39,7 +41,8 @@ class User(UserMixin, db.Model):
     )
 
     # Избранные статьи (many-to-many через user_favorites)
-    # lazy='select' чтобы current_user.favorites.append/remove работали привычно
+    # Для проверок и переключения избранного - favorite_ids/add_favorite/remove_favorite,
+    # они работают с user_favorites напрямую и не загружают коллекцию
     favorites = db.relationship(
         'Article',
         secondary=user_favorites,
@@ -53,21 +56,95 @@ class User(UserMixin, db.Model):
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
+    def get_selected_source_ids(self):
+        """Отсортированный кортеж id выбранных источников (пустой - все источники).
+
+        Считается один раз за HTTP-запрос (хранится в g). Между запросами не
+        кэшируется: кэш в памяти одного воркера не видит сохранение настроек
+        в другом, а запрос идет по первичному ключу user_sources.
+        """
+        memo = g.setdefault('selected_source_ids', {}) if has_request_context() else {}
+        if self.id in memo:
+            return memo[self.id]
+
+        rows = db.session.execute(
+            db.select(user_sources.c.source_id).where(user_sources.c.user_id == self.id)
+        )
+        source_ids = tuple(sorted(row.source_id for row in rows))
+        memo[self.id] = source_ids
+        return source_ids
+
+    def set_selected_sources(self, source_ids):
+        """Заменяет выбранные источники по разнице с текущими (без commit).
+
+        Один SELECT текущих id, один DELETE снятых и один INSERT добавленных -
+        число запросов не зависит от числа источников.
+        """
+        wanted = set(source_ids)
+        rows = db.session.execute(
+            db.select(user_sources.c.source_id).where(user_sources.c.user_id == self.id)
+        )
+        current = {row.source_id for row in rows}
+
+        removed = current - wanted
+        added = wanted - current
+        if removed:
+            db.session.execute(user_sources.delete().where(
+                user_sources.c.user_id == self.id,
+                user_sources.c.source_id.in_(removed)
+            ))
+        if added:
+            db.session.execute(user_sources.insert(), [
+                {'user_id': self.id, 'source_id': source_id} for source_id in sorted(added)
+            ])
+        return added, removed
+
+    def invalidate_selected_sources(self):
+        """Сбрасывает запомненные в запросе id источников после изменения selected_sources"""
+        if has_request_context():
+            g.get('selected_source_ids', {}).pop(self.id, None)
+
+    def favorite_ids(self, article_ids):
+        """Какие из article_ids в избранном: один запрос по первичному ключу
+        user_favorites, без загрузки всего списка избранного."""
+        article_ids = list(article_ids)
+        if not article_ids:
+            return set()
+        rows = db.session.execute(
+            db.select(user_favorites.c.article_id).where(
+                user_favorites.c.user_id == self.id,
+                user_favorites.c.article_id.in_(article_ids)
+            )
+        )
+        return {row.article_id for row in rows}
+
     def add_favorite(self, article):
         """Добавить статью в избранное (если ещё не добавлена)."""
-        if article not in self.favorites:
-            self.favorites.append(article)
-            db.session.commit()
+        try:
+            with db.session.begin_nested():
+                db.session.execute(user_favorites.insert().values(
+                    user_id=self.id, article_id=article.id, created_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Уже в избранном
+            return False
+        db.session.commit()
+        return True
 
     def remove_favorite(self, article):
         """Удалить статью из избранного (если есть)."""
-        if article in self.favorites:
-            self.favorites.remove(article)
-            db.session.commit()
+        result = db.session.execute(user_favorites.delete().where(
+            user_favorites.c.user_id == self.id,
+            user_favorites.c.article_id == article.id
+        ))
+        if not result.rowcount:
+            return False
+        db.session.commit()
+        return True
 
     def is_favorite(self, article) -> bool:
         """Проверить, в избранном ли статья."""
-        return article in self.favorites
+        return article.id in self.favorite_ids([article.id])
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -100,7 +177,170 @@ class Article(db.Model):
     summary = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Сюжеты (story_clusters.py): MinHash-подпись заголовка и id статьи-представителя
+    # сюжета; у представителя и у статей без похожих story_id = NULL
+    story_signature = db.Column(db.LargeBinary)
+    story_id = db.Column(db.Integer, db.ForeignKey('article.id', ondelete='SET NULL'))
+
     source = db.relationship('NewsSource', backref=db.backref('articles', lazy=True))
 
     def __repr__(self):
         return f'<Article {self.title[:50]}>'
+
+
+class FeedState(db.Model):
+    """Валидаторы последнего ответа ленты для условных запросов (ETag / Last-Modified)"""
+    id = db.Column(db.Integer, primary_key=True)
+    feed_url = db.Column(db.String(500), unique=True, nullable=False)
+    etag = db.Column(db.String(255))
+    last_modified = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64))
+    checked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def load(cls, feed_urls):
+        """Возвращает словарь feed_url -> FeedState одним запросом"""
+        if not feed_urls:
+            return {}
+        states = cls.query.filter(cls.feed_url.in_(list(feed_urls))).all()
+        return {state.feed_url: state for state in states}
+
+    @classmethod
+    def remember(cls, feed_url, etag=None, last_modified=None, content_hash=None,
+                 changed=True, state=None):
+        """Сохраняет валидаторы после успешной обработки ленты (без commit)"""
+        now = datetime.utcnow()
+        if state is None:
+            state = cls.query.filter_by(feed_url=feed_url).first()
+        if state is None:
+            state = cls(feed_url=feed_url)
+            db.session.add(state)
+
+        state.checked_at = now
+        if changed:
+            state.etag = etag
+            state.last_modified = last_modified
+            state.content_hash = content_hash
+            state.changed_at = now
+        return state
+
+    def request_headers(self):
+        """Заголовки условного GET-запроса"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def __repr__(self):
+        return f'<FeedState {self.feed_url}>'
+
+
+class SummaryCache(db.Model):
+    """Кэш сводок: ключ - хэш нормализованного текста и числа предложений"""
+    key = db.Column(db.String(64), primary_key=True)
+    summary = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<SummaryCache {self.key[:12]}>'
+
+
+class ArticleTopic(db.Model):
+    """Релевантность статьи теме (число совпадений ключевых слов), считается при загрузке.
+
+    published_at и source_id продублированы из статьи, чтобы выборка по теме
+    шла по индексу этой таблицы без сканирования article.
+    """
+    __tablename__ = 'article_topic'
+    __table_args__ = (
+        db.Index('ix_article_topic_topic_published', 'topic', 'published_at'),
+    )
+
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id', ondelete='CASCADE'),
+                           primary_key=True)
+    topic = db.Column(db.String(20), primary_key=True)
+    score = db.Column(db.Integer, nullable=False)
+    published_at = db.Column(db.DateTime, nullable=False)
+    source_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<ArticleTopic {self.article_id} {self.topic}={self.score}>'
+
+
+class SchemaVersion(db.Model):
+    """Примененные миграции схемы (см. migrations.py)"""
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchemaVersion {self.version} {self.name}>'
+
+
+class DataVersion(db.Model):
+    """Счетчик изменений данных - версия для кэшей в памяти процессов.
+
+    Увеличивается в той же транзакции, что и само изменение, поэтому другие
+    процессы видят новую версию вместе с новыми данными, а не раньше.
+    """
+    __tablename__ = 'data_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def bump(cls, name='articles'):
+        """Увеличивает счетчик name (без commit)"""
+        updated = cls.query.filter_by(name=name).update(
+            {'version': cls.version + 1}, synchronize_session=False
+        )
+        if updated:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(cls(name=name, version=1))
+        except IntegrityError:
+            # Строку одновременно создал другой процесс
+            cls.query.filter_by(name=name).update(
+                {'version': cls.version + 1}, synchronize_session=False
+            )
+
+    @classmethod
+    def current(cls, name='articles'):
+        return db.session.query(cls.version).filter_by(name=name).scalar() or 0
+
+    def __repr__(self):
+        return f'<DataVersion {self.name} {self.version}>'
+
+
+class FeedSchedule(db.Model):
+    """Расписание опроса ленты: оценка частоты публикаций и время следующего опроса"""
+    __tablename__ = 'feed_schedule'
+    id = db.Column(db.Integer, primary_key=True)
+    feed_key = db.Column(db.String(500), unique=True, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # 'rss' или 'newsapi'
+    rate = db.Column(db.Float)  # сглаженное число новых статей в час
+    interval = db.Column(db.Integer, nullable=False)  # секунды до следующего опроса
+    failures = db.Column(db.Integer, default=0, nullable=False)
+    last_new = db.Column(db.Integer)
+    last_run_at = db.Column(db.DateTime)
+    next_run_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<FeedSchedule {self.feed_key} next={self.next_run_at}>'
+
+
+class SchedulerLock(db.Model):
+    """Аренда лидерства: опрашивает ленты только владелец неистекшей записи"""
+    __tablename__ = 'scheduler_lock'
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<SchedulerLock {self.name} {self.owner}>'
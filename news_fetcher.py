@@ -1,31 +1,26 @@
 #news_aggregator/news_fetcher.py
 
+import hashlib
+import json
 import requests
 from datetime import datetime, timedelta
-from models import db, NewsSource, Article
-from summarizer import summarize_text
-from config import Config
+from models import db, NewsSource, Article, FeedState, DataVersion
+from article_store import load_source_map
+from pagination import paginate_feed
+from cache import invalidate_source_caches
+from story_clusters import collapse_stories
+from newsapi_client import get_client, chunked, NewsAPIError
 
 
 def fetch_all_sources():
     """Получает список всех доступных источников новостей"""
-    url = f"https://newsapi.org/v2/sources"
-    params = {
-        'apiKey': Config.NEWS_API_KEY,
-        'language': 'ru',
-        'country': 'ru'
-    }
-
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        sources_data = data.get('sources', [])
+        sources_data = get_client().sources(language='ru', country='ru')
+        source_map = load_source_map()
+        created = False
 
         for source_data in sources_data:
-            existing_source = NewsSource.query.filter_by(
-                source_id=source_data['id']).first()
+            existing_source = source_map.get(source_data['id'])
 
             if not existing_source:
                 source = NewsSource(
@@ -39,110 +34,128 @@ def fetch_all_sources():
                     is_active=True
                 )
                 db.session.add(source)
+                source_map[source.source_id] = source
+                created = True
 
+        if created:
+            DataVersion.bump('sources')
         db.session.commit()
+        invalidate_source_caches()
         return len(sources_data)
 
-    except requests.RequestException as e:
+    except (requests.RequestException, NewsAPIError) as e:
         print(f"Ошибка при получении источников: {e}")
         return 0
 
 
-def fetch_news_from_sources(source_ids=None, days_back=1):
-    """Получает новости из указанных источников"""
-    if not source_ids:
-        sources = NewsSource.query.filter_by(is_active=True).all()
-        source_ids = [source.source_id for source in sources]
-
-    from_date = (datetime.now() - timedelta(days=days_back)).isoformat()
-
-    url = "https://newsapi.org/v2/everything"
-    params = {
-        'apiKey': Config.NEWS_API_KEY,
-        'sources': ','.join(source_ids),
-        'from': from_date,
-        'sortBy': 'publishedAt',
-        'pageSize': 100
-    }
+def fetch_news_from_sources(source_ids=None, days_back=1, writer=None):
+    """Получает новости из указанных источников.
 
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+    Источники делятся на куски по MAX_SOURCES_PER_REQUEST (лимит API), каждый
+    кусок - задание конвейера ingest_pipeline со всеми страницами выдачи:
+    загрузка -> нормализация -> отсев дубликатов -> пакетная запись -> сводки.
+    writer - свой ArticleWriter, если вызывающему нужна статистика по лентам.
+    """
+    from ingest_pipeline import (
+        Pipeline, Stage, IngestJob, ArticleWriter,
+        dedup_stage, write_stage, summarize_stage
+    )
 
-        articles_data = data.get('articles', [])
-        new_articles_count = 0
+    client = get_client()
 
-        for article_data in articles_data:
-            # Проверяем, не существует ли уже такая статья
-            existing_article = Article.query.filter_by(
-                url=article_data['url']).first()
-
-            if existing_article:
-                continue
-
-            # Находим источник в БД
-            source = NewsSource.query.filter_by(
-                source_id=article_data['source']['id']).first()
+    # Все источники одним запросом: и для списка, и для сопоставления статей
+    source_map = load_source_map()
+    if not source_ids:
+        source_ids = [sid for sid, source in source_map.items() if source.is_active]
+    source_pks = {sid: source.id for sid, source in source_map.items()}
+
+    # Окно фиксировано на время цикла: новые статьи не сдвигают страницы выдачи
+    now = datetime.now()
+    window = {
+        'from': (now - timedelta(days=days_back)).isoformat(),
+        'to': now.isoformat(),
+        'sortBy': 'publishedAt'
+    }
 
-            if not source:
+    # Ключ ленты не зависит от окна, чтобы валидаторы переживали циклы
+    url = f"{client.base_url}/everything"
+    chunks = {f"{url}?sources={','.join(chunk)}": chunk for chunk in chunked(sorted(source_ids))}
+    states = FeedState.load(list(chunks))
+    jobs = [
+        IngestJob(feed_key, f'NewsAPI {chunk[0]}..{chunk[-1]}', url=url,
+                  state=states.get(feed_key), params=dict(window, sources=','.join(chunk)))
+        for feed_key, chunk in chunks.items()
+    ]
+
+    def fetch(job):
+        headers = job.state.request_headers() if job.state else {}
+        response, articles_data = client.everything(job.params, headers)
+        if articles_data is None:
+            job.not_modified = True
+            yield job
+            return
+
+        # Хэш самих статей: ответ с тем же набором статей не разбираем повторно
+        job.content_hash = hashlib.sha256(
+            json.dumps(articles_data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        if job.state and job.state.content_hash == job.content_hash:
+            job.not_modified = True
+            yield job
+            return
+
+        job.etag = response.headers.get('ETag')
+        job.last_modified = response.headers.get('Last-Modified')
+        job.payload = articles_data
+        yield job
+
+    def normalize(job):
+        for article_data in job.payload or ():
+            # Находим источник в предзагруженном словаре
+            source_pk = source_pks.get((article_data.get('source') or {}).get('id'))
+            if not source_pk or not article_data.get('url'):
                 continue
 
-            # Создаем полный текст для суммаризации
-            title = article_data.get('title', '')
-            description = article_data.get('description', '')
-            content = article_data.get('content', '')
-            full_text = ' '.join([part for part in [title, description, content] if part])
-
-            # Создаем сводку
-            summary = ""
-            if full_text.strip():
-                try:
-                    summary = summarize_text(full_text, sentences_count=2)
-                except:
-                    summary = description[:200] + "..." if description else ""
-
             # Парсим дату публикации
             published_at = datetime.fromisoformat(
                 article_data['publishedAt'].replace('Z', '+00:00'))
 
-            article = Article(
-                title=title,
-                description=description,
-                content=content,
-                url=article_data['url'],
-                url_to_image=article_data.get('urlToImage'),
-                published_at=published_at,
-                source_id=source.id,
-                summary=summary
-            )
-
-            db.session.add(article)
-            new_articles_count += 1
-
-        db.session.commit()
-        return new_articles_count
-
-    except requests.RequestException as e:
-        print(f"Ошибка при получении новостей: {e}")
-        return 0
-
-
-def get_user_articles(user, page=1, per_page=20):
-    """Получает статьи для пользователя на основе выбранных источников"""
-    if not user.selected_sources:
+            job.rows.append({
+                'title': article_data.get('title', ''),
+                'description': article_data.get('description', ''),
+                'content': article_data.get('content', ''),
+                'url': article_data['url'],
+                'url_to_image': article_data.get('urlToImage'),
+                'published_at': published_at,
+                'source_id': source_pk
+            })
+        job.payload = None
+        yield job
+
+    writer = writer or ArticleWriter()
+    pipeline = Pipeline([
+        Stage('fetch', fetch, client.max_workers),
+        Stage('normalize', normalize),
+        dedup_stage(),
+        write_stage(writer),
+        summarize_stage(),
+    ])
+    pipeline.run(jobs)
+    pipeline.report(f"NewsAPI: {len(source_ids)} источников, {len(jobs)} запросов")
+    return writer.inserted
+
+
+def get_user_articles(user, page=1, per_page=20, after=None, before=None):
+    """Получает статьи для пользователя на основе выбранных источников.
+
+    Сначала с картинками, затем свежие; пагинация - см. pagination.paginate_feed.
+    """
+    source_ids = user.get_selected_source_ids()
+    if not source_ids:
         # Если пользователь не выбрал источники, показываем все
-        return Article.query.order_by(
-            Article.url_to_image.isnot(None).desc(),  # Сначала с картинками
-            Article.published_at.desc()
-        ).paginate(
-            page=page, per_page=per_page, error_out=False)
-
-    source_ids = [source.id for source in user.selected_sources]
-    return Article.query.filter(
-        Article.source_id.in_(source_ids)
-    ).order_by(
-        Article.url_to_image.isnot(None).desc(),  # Сначала с картинками
-        Article.published_at.desc()
-    ).paginate(
-        page=page, per_page=per_page, error_out=False)
\ No newline at end of file
+        return paginate_feed(collapse_stories(Article.query), page, per_page, after, before)
+
+    return paginate_feed(
+        collapse_stories(Article.query.filter(Article.source_id.in_(source_ids)), source_ids),
+        page, per_page, after, before
+    )
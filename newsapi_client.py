@@ -0,0 +1,188 @@
+# news_aggregator/newsapi_client.py
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+
+# Ограничения API: до 20 источников в параметре sources, до 100 статей на страницу
+MAX_SOURCES_PER_REQUEST = 20
+MAX_PAGE_SIZE = 100
+
+USER_AGENT = 'NewsAggregator/1.0 (+newsapi)'
+
+
+class NewsAPIError(Exception):
+    """Ответ NewsAPI со status=error: code и message из тела ответа"""
+
+    def __init__(self, code, message, status_code=None):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Потокобезопасный бюджет запросов: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Ждет, пока появится токен, и забирает его"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def chunked(items, size=MAX_SOURCES_PER_REQUEST):
+    """Делит список на куски по size элементов"""
+    items = list(items)
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class NewsAPIClient:
+    """Клиент NewsAPI на общей сессии с пулом соединений.
+
+    Ответы 429 и 5xx и сетевые ошибки повторяются внутри сессии с
+    экспоненциальной задержкой (с учетом Retry-After); каждый запрос страницы
+    сначала берет токен из общего бюджета. Первые страницы запрашивают до
+    max_workers потоков вызывающего кода, остальные страницы всех наборов
+    идут через один общий пул из page_workers потоков - под сумму и
+    рассчитан пул соединений.
+    """
+
+    def __init__(self, api_key=None, base_url=None, timeout=None, retries=None,
+                 rate=None, burst=None, max_workers=None, max_pages=None,
+                 page_workers=None):
+        self.base_url = (base_url or Config.NEWSAPI_BASE_URL).rstrip('/')
+        self.timeout = timeout or Config.NEWSAPI_TIMEOUT
+        self.max_workers = max_workers or Config.NEWSAPI_MAX_WORKERS
+        self.page_workers = page_workers or Config.NEWSAPI_PAGE_WORKERS
+        self.max_pages = max_pages or Config.NEWSAPI_MAX_PAGES
+        self.pages = ThreadPoolExecutor(max_workers=self.page_workers,
+                                        thread_name_prefix='newsapi-page')
+        self.bucket = TokenBucket(rate or Config.NEWSAPI_RATE_PER_SECOND,
+                                  burst or Config.NEWSAPI_BURST)
+
+        retries = Config.NEWSAPI_RETRIES if retries is None else retries
+        retry = Retry(
+            total=retries,
+            backoff_factor=Config.NEWSAPI_BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        # В полете одновременно не больше max_workers первых страниц и page_workers остальных
+        adapter = HTTPAdapter(pool_maxsize=self.max_workers + self.page_workers,
+                              max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Ключ в заголовке, а не в URL: не попадает в логи и тексты ошибок
+        self.session.headers.update({
+            'X-Api-Key': api_key or Config.NEWS_API_KEY,
+            'User-Agent': USER_AGENT
+        })
+
+    def get(self, path, params=None, headers=None):
+        """GET к методу API в рамках бюджета запросов; возвращает Response"""
+        self.bucket.acquire()
+        return self.session.get(f"{self.base_url}/{path}", params=params,
+                                headers=headers, timeout=self.timeout)
+
+    @staticmethod
+    def payload(response):
+        """Тело ответа; для ошибок API - NewsAPIError с кодом из тела"""
+        try:
+            data = response.json()
+        except ValueError:
+            response.raise_for_status()
+            raise NewsAPIError('invalidResponse', 'ответ не JSON', response.status_code)
+
+        if response.status_code >= 400 or data.get('status') == 'error':
+            raise NewsAPIError(data.get('code', 'httpError'),
+                               data.get('message', response.reason), response.status_code)
+        return data
+
+    def sources(self, **params):
+        """Список источников /sources"""
+        return self.payload(self.get('sources', params)).get('sources', [])
+
+    def everything(self, params, headers=None):
+        """Все страницы /everything для одного набора параметров.
+
+        Первая страница запрашивается с условными заголовками headers; по ее
+        totalResults остальные (не больше max_pages) грузятся параллельно в
+        общем пуле страниц, в пределах бюджета запросов. Возвращает
+        (ответ первой страницы, статьи) или (ответ, None) при 304.
+        """
+        params = dict(params, pageSize=MAX_PAGE_SIZE)
+        first = self.get('everything', dict(params, page=1), headers)
+        if first.status_code == 304:
+            return first, None
+
+        data = self.payload(first)
+        articles = list(data.get('articles', []))
+        pages = min(math.ceil((data.get('totalResults') or 0) / MAX_PAGE_SIZE), self.max_pages)
+        futures = [self.pages.submit(self._page, params, page) for page in range(2, pages + 1)]
+        try:
+            for future in futures:
+                articles.extend(future.result())
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        return first, articles
+
+    def _page(self, params, page):
+        try:
+            return self.payload(self.get('everything', dict(params, page=page))).get('articles', [])
+        except NewsAPIError as e:
+            # Тариф ограничивает глубину выдачи - дальше страниц не будет
+            if e.code == 'maximumResultsReached':
+                print(f"⚠️  NewsAPI: страница {page} за пределом тарифа")
+                return []
+            raise
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Общий клиент процесса: одна сессия и один бюджет запросов на все вызовы"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = NewsAPIClient()
+        return _client
+
+
+def share_budget(parts):
+    """Оставляет клиенту процесса 1/parts бюджета запросов.
+
+    Бюджет считается на ключ API, а TokenBucket - в памяти процесса: когда
+    ключ делят parts процессов (воркеры ingest-worker на всех хостах),
+    каждый получает свою долю, чтобы вместе не превысить лимит.
+    """
+    client = get_client()
+    client.bucket = TokenBucket(Config.NEWSAPI_RATE_PER_SECOND / parts,
+                                max(1, Config.NEWSAPI_BURST // parts))
+    return client.bucket
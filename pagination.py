@@ -0,0 +1,84 @@
+# news_aggregator/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy.orm import joinedload
+from models import db, Article
+from config import Config
+
+# Ключ сортировки ленты: сначала с картинками, затем свежие; id - для уникальности
+HAS_IMAGE = Article.url_to_image.isnot(None)
+FEED_KEY = (HAS_IMAGE, Article.published_at, Article.id)
+
+
+class KeysetPage:
+    """Страница ленты с курсорной пагинацией по (has_image, published_at, id).
+
+    В отличие от paginate() не делает OFFSET и COUNT(*): страница N стоит
+    столько же, сколько первая. Вместо номеров страниц - курсоры after/before.
+    """
+
+    def __init__(self, items, per_page, has_next, has_prev):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = encode_cursor(items[-1]) if items and has_next else None
+        self.prev_cursor = encode_cursor(items[0]) if items and has_prev else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def encode_cursor(article):
+    key = [int(article.url_to_image is not None), article.published_at.isoformat(), article.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; для испорченного курсора возвращает None (первая страница)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        has_image, published_at, article_id = json.loads(base64.urlsafe_b64decode(padded))
+        return bool(has_image), datetime.fromisoformat(published_at), int(article_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_paginate(query, per_page=20, after=None, before=None):
+    """Курсорная пагинация запроса статей в порядке ленты"""
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before and not after_key else None
+
+    if before_key:
+        # Идем назад: берем ближайшие записи "выше" курсора и разворачиваем
+        rows = query.filter(
+            db.tuple_(*FEED_KEY) > db.tuple_(*before_key)
+        ).order_by(
+            *(column.asc() for column in FEED_KEY)
+        ).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        return KeysetPage(list(reversed(rows[:per_page])), per_page, True, has_prev)
+
+    if after_key:
+        query = query.filter(db.tuple_(*FEED_KEY) < db.tuple_(*after_key))
+
+    rows = query.order_by(
+        *(column.desc() for column in FEED_KEY)
+    ).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    return KeysetPage(rows[:per_page], per_page, has_next, after_key is not None)
+
+
+def paginate_feed(query, page=1, per_page=20, after=None, before=None):
+    """Пагинация ленты: курсорная по умолчанию, по номерам страниц - если
+    FEED_PAGINATION = 'pages'. Источники статей загружаются тем же запросом."""
+    query = query.options(joinedload(Article.source))
+    if Config.FEED_PAGINATION == 'pages':
+        return query.order_by(
+            HAS_IMAGE.desc(),
+            Article.published_at.desc()
+        ).paginate(page=page, per_page=per_page, error_out=False)
+
+    return keyset_paginate(query, per_page, after, before)
@@ -0,0 +1,42 @@
+# news_aggregator/query_guard.py
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCountExceeded(Exception):
+    """Запрос к приложению выполнил больше SQL-запросов, чем разрешено"""
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    # Считаем только запросы, выполненные в рамках HTTP-запроса
+    if has_request_context() and 'query_count' in g:
+        g.query_count += 1
+
+
+def init_query_guard(app):
+    """Подключает счетчик SQL-запросов на HTTP-запрос.
+
+    При QUERY_COUNT_LIMIT > 0 (для тестов и разработки) запрос, выполнивший
+    больше запросов к БД, завершается ошибкой - так N+1 ловится сразу, а не
+    в продакшене. Число запросов отдается в заголовке X-Query-Count.
+    """
+    limit = app.config.get('QUERY_COUNT_LIMIT', 0)
+    if not limit:
+        return
+
+    @app.before_request
+    def reset_query_count():
+        g.query_count = 0
+
+    @app.after_request
+    def check_query_count(response):
+        count = g.pop('query_count', 0)
+        response.headers['X-Query-Count'] = str(count)
+        if count > limit:
+            raise QueryCountExceeded(
+                f"{request.method} {request.path}: {count} SQL-запросов, лимит {limit}"
+            )
+        return response
@@ -0,0 +1,77 @@
+# news_aggregator/query_plans.py
+
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from models import db, Article, user_favorites, user_sources
+from pagination import FEED_KEY
+from topic_index import topic_query
+from story_clusters import collapse_stories
+
+# Значения параметров для примеров запросов: на план они почти не влияют
+SAMPLE_SOURCE_IDS = [1, 2, 3]
+SAMPLE_USER_ID = 1
+
+
+def hot_queries():
+    """Горячие запросы приложения в той форме, в которой их строят маршруты"""
+    feed_order = [column.desc() for column in FEED_KEY]
+    cursor = (True, datetime.utcnow() - timedelta(days=1), 1000)
+
+    return [
+        ('Лента, первая страница',
+         collapse_stories(Article.query).order_by(*feed_order).limit(21)),
+        ('Лента по источникам',
+         collapse_stories(Article.query.filter(
+             Article.source_id.in_(SAMPLE_SOURCE_IDS)
+         ), SAMPLE_SOURCE_IDS).order_by(*feed_order).limit(21)),
+        ('Лента, страница по курсору',
+         collapse_stories(Article.query).filter(
+             db.tuple_(*FEED_KEY) < db.tuple_(*cursor)
+         ).order_by(*feed_order).limit(21)),
+        ('Избранное пользователя',
+         Article.query.join(
+             user_favorites, user_favorites.c.article_id == Article.id
+         ).filter(
+             user_favorites.c.user_id == SAMPLE_USER_ID
+         ).order_by(*feed_order).limit(21)),
+        ('Выжимка по источникам',
+         collapse_stories(Article.query.filter(
+             Article.source_id.in_(SAMPLE_SOURCE_IDS)
+         ), SAMPLE_SOURCE_IDS).order_by(Article.published_at.desc()).limit(15)),
+        ('Статьи по теме',
+         topic_query('politics', SAMPLE_SOURCE_IDS)),
+        ('Старые статьи (clean-old-articles)',
+         db.session.query(db.func.count(Article.id)).filter(
+             Article.published_at < datetime.utcnow() - timedelta(days=7)
+         )),
+        ('Статьи без сводки',
+         db.session.query(Article.id).filter(
+             Article.summary.is_(None), Article.id > 0
+         ).order_by(Article.id).limit(200)),
+        ('Подписчики статьи в избранном',
+         db.session.query(user_favorites.c.user_id).filter(
+             user_favorites.c.article_id == 1
+         )),
+        ('Пользователи источника',
+         db.session.query(user_sources.c.user_id).filter(
+             user_sources.c.source_id == 1
+         )),
+    ]
+
+
+def explain(query):
+    """Возвращает строки плана выполнения запроса для текущей СУБД"""
+    dialect = db.engine.dialect
+    sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+    if dialect.name == 'sqlite':
+        rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).fetchall()
+        return [row[-1] for row in rows]
+
+    rows = db.session.execute(text('EXPLAIN ' + sql)).fetchall()
+    return [row[0] for row in rows]
+
+
+def explain_hot_queries():
+    """Список (название, строки плана) для всех горячих запросов"""
+    return [(name, explain(query)) for name, query in hot_queries()]
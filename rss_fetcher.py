@@ -1,151 +1,299 @@
 import feedparser
+import hashlib
 import requests
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime
+from urllib.parse import urlparse
+from config import Config
 
 
-def fetch_rss_sources():
-    """RSS источники русских новостей"""
-    # Импортируем здесь чтобы избежать циклических импортов
-    from models import db, NewsSource, Article
-    from summarizer import summarize_text
-
-    rss_sources = [
-        {
-            'name': 'Lenta.ru',
-            'url': 'https://lenta.ru/rss/news',
-            'category': 'general'
-        },
-        {
-            'name': 'RBC',
-            'url': 'https://rssexport.rbc.ru/rbcnews/news/20/full.rss',
-            'category': 'general'
-        },
-        {
-            'name': 'Kommersant',
-            'url': 'https://www.kommersant.ru/RSS/main.xml',
-            'category': 'business'
-        },
-        {
-            'name': 'Lenta.ru',
-            'url': 'https://lenta.ru/rss/news',
-            'category': 'general'
-        },
-        {
-            'name': 'Gazeta.ru',
-            'url': 'https://www.gazeta.ru/export/rss/lenta.xml',
-            'category': 'general'
-        },
-        {
-            'name': 'Vedomosti',
-            'url': 'https://www.vedomosti.ru/rss/news',
-            'category': 'business'
-        },
-        {
-            'name': 'Sport Express',
-            'url': 'https://www.sport-express.ru/services/materials/rss/',
-            'category': 'sports'
-        },
-        {
-            'name': 'Interfax',
-            'url': 'https://www.interfax.ru/rss.asp',
-            'category': 'general'
-        }
-    ]
+RSS_SOURCES = [
+    {
+        'name': 'Lenta.ru',
+        'url': 'https://lenta.ru/rss/news',
+        'category': 'general'
+    },
+    {
+        'name': 'RBC',
+        'url': 'https://rssexport.rbc.ru/rbcnews/news/20/full.rss',
+        'category': 'general'
+    },
+    {
+        'name': 'Kommersant',
+        'url': 'https://www.kommersant.ru/RSS/main.xml',
+        'category': 'business'
+    },
+    {
+        'name': 'Lenta.ru',
+        'url': 'https://lenta.ru/rss/news',
+        'category': 'general'
+    },
+    {
+        'name': 'Gazeta.ru',
+        'url': 'https://www.gazeta.ru/export/rss/lenta.xml',
+        'category': 'general'
+    },
+    {
+        'name': 'Vedomosti',
+        'url': 'https://www.vedomosti.ru/rss/news',
+        'category': 'business'
+    },
+    {
+        'name': 'Sport Express',
+        'url': 'https://www.sport-express.ru/services/materials/rss/',
+        'category': 'sports'
+    },
+    {
+        'name': 'Interfax',
+        'url': 'https://www.interfax.ru/rss.asp',
+        'category': 'general'
+    }
+]
+
+USER_AGENT = 'NewsAggregator/1.0 (+rss)'
+
+# Результат загрузки ленты; feed = None, если лента не изменилась
+FeedDownload = namedtuple('FeedDownload', 'feed etag last_modified content_hash not_modified')
+
+# Семафоры ограничивают число одновременных соединений к одному хосту
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def _host_semaphore(url):
+    host = urlparse(url).netloc
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(Config.RSS_PER_HOST_LIMIT)
+        return _host_semaphores[host]
+
+
+def download_feed(url, timeout=None, validators=None, parse=True):
+    """Скачивает и разбирает RSS-ленту с таймаутом и лимитом соединений на хост.
+
+    timeout - общий бюджет на ожидание хоста, соединение и чтение тела.
+    validators - словарь с ключами etag, last_modified, content_hash от
+    прошлой загрузки. Если сервер ответил 304 или содержимое не изменилось,
+    лента не разбирается и возвращается FeedDownload с not_modified=True.
+    При parse=False в feed возвращается тело ответа (разбор - отдельная стадия).
+    """
+    timeout = timeout or Config.RSS_REQUEST_TIMEOUT
+    validators = validators or {}
+    semaphore = _host_semaphore(url)
+
+    headers = {'User-Agent': USER_AGENT}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
 
-    total_new = 0
+    deadline_at = time.monotonic() + timeout
+    if not semaphore.acquire(timeout=timeout):
+        raise TimeoutError(f"хост {urlparse(url).netloc} занят дольше {timeout} с")
+    try:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"{url}: не осталось времени на загрузку")
+        response = requests.get(url, timeout=remaining, headers=headers, stream=True)
+        if response.status_code == 304:
+            response.close()
+            return FeedDownload(None, validators.get('etag'), validators.get('last_modified'),
+                                validators.get('content_hash'), True)
+        response.raise_for_status()
+        content = _read_body(response, deadline_at)
+    finally:
+        semaphore.release()
 
-    for rss_data in rss_sources:
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    content_hash = hashlib.sha256(content).hexdigest()
+    if content_hash == validators.get('content_hash'):
+        return FeedDownload(None, etag, last_modified, content_hash, True)
+
+    feed = feedparser.parse(content) if parse else content
+    return FeedDownload(feed, etag, last_modified, content_hash, False)
+
+
+def _read_body(response, deadline_at):
+    """Читает тело ответа по частям; таймаут requests ограничивает только паузы
+    между пакетами, поэтому медленную отдачу обрываем по общему дедлайну"""
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is not None:
+        # urllib3 2.x: отдает то, что уже пришло, не дожидаясь полного куска
+        parts = iter(lambda: read1(64 * 1024, decode_content=True), b'')
+    else:
+        parts = response.iter_content(1024)
+
+    chunks = []
+    for chunk in parts:
+        if time.monotonic() > deadline_at:
+            response.close()
+            raise TimeoutError(f"{response.url}: загрузка не уложилась в отведенное время")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def ensure_rss_sources():
+    """Создает недостающие источники RSS, возвращает словарь name -> id.
+
+    Если тот же источник одновременно создал другой процесс, берет его запись.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from models import db, NewsSource, DataVersion
+    from article_store import load_source_map
+    from cache import invalidate_source_caches
+
+    source_map = load_source_map(key='name')
+    created = False
+    for rss_data in RSS_SOURCES:
+        if rss_data['name'] in source_map:
+            continue
+        source = NewsSource(
+            name=rss_data['name'],
+            source_id=rss_data['name'].lower().replace('.', '_').replace(' ', '_'),
+            category=rss_data['category'],
+            language='ru',
+            country='ru',
+            is_active=True
+        )
+        db.session.add(source)
+        source_map[source.name] = source
+        created = True
+        print(f"✅ Создан новый источник: {rss_data['name']}")
+
+    if created:
         try:
-            print(f"🔄 Загружаем RSS: {rss_data['name']} - {rss_data['url']}")
-
-            # Парсим RSS с timeout
-            feed = feedparser.parse(rss_data['url'])
-
-            if not feed.entries:
-                print(f"❌ RSS {rss_data['name']}: нет статей в ленте")
-                continue
-
-            print(f"📄 RSS {rss_data['name']}: найдено {len(feed.entries)} статей в ленте")
-
-            # Создать источник если не существует
-            source = NewsSource.query.filter_by(name=rss_data['name']).first()
-            if not source:
-                source = NewsSource(
-                    name=rss_data['name'],
-                    source_id=rss_data['name'].lower().replace('.', '_').replace(' ', '_'),
-                    category=rss_data['category'],
-                    language='ru',
-                    country='ru',
-                    is_active=True
-                )
-                db.session.add(source)
-                db.session.commit()
-                print(f"✅ Создан новый источник: {rss_data['name']}")
-
-            # Загрузить статьи из RSS
-            new_articles = 0
-            for i, entry in enumerate(feed.entries[:20]):  # Первые 20 статей
-                if not hasattr(entry, 'link') or not entry.link:
-                    print(f"⚠️  Статья {i + 1}: нет ссылки")
-                    continue
-
-                existing = Article.query.filter_by(url=entry.link).first()
-                if existing:
-                    continue
-
-                # Создаем сводку
-                title = getattr(entry, 'title', 'Без заголовка')
-                description = getattr(entry, 'description', '')
-                summary = ""
-
-                if description:
-                    try:
-                        # Убираем HTML теги
-                        import re
-                        clean_desc = re.sub(r'<[^>]+>', '', description)
-                        summary = summarize_text(clean_desc, sentences_count=1)
-                    except Exception as e:
-                        print(f"⚠️  Ошибка суммаризации: {e}")
-                        summary = description[:200] + "..." if len(description) > 200 else description
-
-                # Парсим дату
-                published_at = datetime.now()
-                if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                    try:
-                        published_at = datetime(*entry.published_parsed[:6])
-                    except Exception as e:
-                        print(f"⚠️  Ошибка парсинга даты: {e}")
-
-                article = Article(
-                    title=title,
-                    description=description,
-                    url=entry.link,
-                    published_at=published_at,
-                    source_id=source.id,
-                    summary=summary
-                )
-
-                try:
-                    db.session.add(article)
-                    new_articles += 1
-                    print(f"➕ Добавлена статья {new_articles}: {title[:50]}...")
-                except Exception as e:
-                    print(f"❌ Ошибка добавления статьи: {e}")
-
-            if new_articles > 0:
-                try:
-                    db.session.commit()
-                    print(f"✅ RSS {rss_data['name']}: добавлено {new_articles} новых статей")
-                    total_new += new_articles
-                except Exception as e:
-                    print(f"❌ Ошибка сохранения в БД: {e}")
-                    db.session.rollback()
-            else:
-                print(f"ℹ️  RSS {rss_data['name']}: новых статей нет (все уже существуют)")
-
-        except Exception as e:
-            print(f"❌ Ошибка RSS {rss_data['name']}: {e}")
+            DataVersion.bump('sources')
+            db.session.commit()
+        except IntegrityError:
             db.session.rollback()
+            print("ℹ️  Источники RSS уже созданы другим процессом")
+            source_map = load_source_map(key='name')
+        invalidate_source_caches()
+    return {name: source.id for name, source in source_map.items()}
+
+
+def _feed_rows(name, feed, source_id):
+    """Строки статей для первых 20 записей ленты (сводку заполнит этап суммаризации)"""
+    if not feed.entries:
+        print(f"❌ RSS {name}: нет статей в ленте")
+        return []
+
+    print(f"📄 RSS {name}: найдено {len(feed.entries)} статей в ленте")
+
+    rows = []
+    for i, entry in enumerate(feed.entries[:20]):
+        if not hasattr(entry, 'link') or not entry.link:
+            print(f"⚠️  Статья {i + 1}: нет ссылки")
+            continue
+
+        title = getattr(entry, 'title', 'Без заголовка')
+        description = getattr(entry, 'description', '')
+
+        # Парсим дату
+        published_at = datetime.now()
+        if hasattr(entry, 'published_parsed') and entry.published_parsed:
+            try:
+                published_at = datetime(*entry.published_parsed[:6])
+            except Exception as e:
+                print(f"⚠️  Ошибка парсинга даты: {e}")
+
+        rows.append({
+            'title': title,
+            'description': description,
+            'url': entry.link,
+            'published_at': published_at,
+            'source_id': source_id
+        })
+    return rows
+
+
+def rss_feed_urls():
+    """Уникальные URL лент RSS_SOURCES в исходном порядке"""
+    return list(dict.fromkeys(rss_data['url'] for rss_data in RSS_SOURCES))
+
+
+def fetch_rss_sources(concurrent=True, urls=None, writer=None):
+    """RSS источники русских новостей.
+
+    Ленты проходят конвейер ingest_pipeline: загрузка -> разбор ->
+    нормализация -> отсев дубликатов -> пакетная запись -> сводки.
+    При concurrent=True ленты скачиваются RSS_MAX_WORKERS потоками, иначе
+    по одной. Каждая загрузка (ожидание хоста, соединение, чтение) ограничена
+    остатком RSS_CYCLE_DEADLINE; не успевшие ленты считаются ошибками.
+    urls - опросить только эти ленты; writer - свой ArticleWriter, чтобы
+    узнать число новых статей по каждой ленте.
+    """
+    # Импортируем здесь чтобы избежать циклических импортов
+    from models import FeedState
+    from ingest_pipeline import (
+        Pipeline, Stage, IngestJob, ArticleWriter,
+        dedup_stage, write_stage, summarize_stage
+    )
+
+    source_ids = ensure_rss_sources()
+
+    # Одинаковые URL (Lenta.ru указан дважды) скачиваем и разбираем один раз
+    feeds = {}
+    for rss_data in RSS_SOURCES:
+        if urls is None or rss_data['url'] in urls:
+            feeds.setdefault(rss_data['url'], []).append(rss_data['name'])
+
+    # Валидаторы прошлых загрузок для условных запросов
+    states = FeedState.load(list(feeds))
+    jobs = [
+        IngestJob(url, ', '.join(dict.fromkeys(names)), url=url, state=states.get(url),
+                  source_names=list(dict.fromkeys(names)))
+        for url, names in feeds.items()
+    ]
+
+    deadline_at = time.monotonic() + Config.RSS_CYCLE_DEADLINE
+
+    def fetch(job):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"{job.name}: не уложились в дедлайн цикла {Config.RSS_CYCLE_DEADLINE} с")
+        print(f"🔄 Загружаем RSS: {job.name} - {job.url}")
+        state = job.state
+        validators = {
+            'etag': state.etag,
+            'last_modified': state.last_modified,
+            'content_hash': state.content_hash
+        } if state else None
+        download = download_feed(job.url, min(Config.RSS_REQUEST_TIMEOUT, remaining),
+                                 validators, parse=False)
+        job.etag, job.last_modified = download.etag, download.last_modified
+        job.content_hash, job.not_modified = download.content_hash, download.not_modified
+        job.payload = download.feed
+        yield job
+
+    def parse(job):
+        if not job.not_modified:
+            job.payload = feedparser.parse(job.payload)
+        yield job
+
+    def normalize(job):
+        if not job.not_modified:
+            for name in job.source_names:
+                job.rows.extend(_feed_rows(name, job.payload, source_ids[name]))
+            job.payload = None
+        yield job
+
+    writer = writer or ArticleWriter()
+    pipeline = Pipeline([
+        Stage('fetch', fetch, Config.RSS_MAX_WORKERS if concurrent else 1),
+        Stage('parse', parse, Config.INGEST_PARSE_WORKERS),
+        Stage('normalize', normalize),
+        dedup_stage(),
+        write_stage(writer),
+        summarize_stage(),
+    ])
+
+    started = time.monotonic()
+    pipeline.run(jobs)
+    pipeline.report(f"RSS: {len(jobs)} лент за {time.monotonic() - started:.1f} с")
 
-    print(f"🎉 Всего добавлено {total_new} новых статей из RSS")
-    return total_new
\ No newline at end of file
+    print(f"🎉 Всего добавлено {writer.inserted} новых статей из RSS")
+    return writer.inserted
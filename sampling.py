@@ -0,0 +1,71 @@
+# news_aggregator/sampling.py
+
+import random
+from sqlalchemy.orm import joinedload
+from models import db, Article
+from story_clusters import collapse_stories
+
+# Предел числа проб на выборку: остаток добирается одним запросом
+MAX_PROBES = 100
+
+
+def _resolve_probes(base, probes):
+    """Первые подходящие id не меньше каждой пробы - одним запросом.
+
+    Каждая проба - поиск min(id) по первичному ключу; пробы объединены
+    через UNION ALL, порядок ответа не важен (выборка все равно случайна).
+    """
+    seeks = [
+        base.with_entities(db.func.min(Article.id).label('id'))
+        .filter(Article.id >= probe).order_by(None).statement
+        for probe in probes
+    ]
+    rows = db.session.execute(db.union_all(*seeks))
+    return [row.id for row in rows if row.id is not None]
+
+
+def random_articles(count, source_ids=None, rng=random):
+    """Случайные статьи без ORDER BY random() по всей таблице.
+
+    Берет случайные числа в диапазоне id (с учетом фильтра по источникам)
+    и для каждого находит первую подходящую статью с id не меньше его - это
+    поиск по первичному ключу, его цена не зависит от размера таблицы. Все
+    пробы разрешаются одним запросом, статьи загружаются вторым, недобор -
+    третьим. Повторы в одной выборке исключаются; если статей меньше, чем
+    нужно, возвращаются все подходящие.
+    """
+    if count <= 0:
+        return []
+
+    base = Article.query.options(joinedload(Article.source))
+    if source_ids:
+        base = base.filter(Article.source_id.in_(source_ids))
+    # Дубликаты одного сюжета в раунде не нужны
+    base = collapse_stories(base, source_ids)
+
+    low, high = base.with_entities(
+        db.func.min(Article.id), db.func.max(Article.id)
+    ).order_by(None).one()
+    if low is None:
+        return []
+
+    probes = sorted({rng.randint(low, high) for _ in range(min(count * 3, MAX_PROBES))})
+    ids = list(dict.fromkeys(_resolve_probes(base, probes)))
+    rng.shuffle(ids)
+    ids = ids[:count]
+
+    picked = {}
+    if ids:
+        picked = {article.id: article for article in base.filter(Article.id.in_(ids))}
+
+    if len(picked) < count:
+        # Мало статей или неудачные пробы - добираем любые еще не выбранные
+        rest = base
+        if picked:
+            rest = rest.filter(Article.id.notin_(list(picked)))
+        for article in rest.limit(count - len(picked)).all():
+            picked[article.id] = article
+
+    articles = list(picked.values())
+    rng.shuffle(articles)
+    return articles
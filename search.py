@@ -0,0 +1,121 @@
+# news_aggregator/search.py
+
+import re
+from sqlalchemy import text, table, column, literal_column, false
+from models import db, Article
+
+# Поисковый индекс: в PostgreSQL - генерируемая колонка tsvector с GIN-индексом,
+# в SQLite - внешняя FTS5-таблица, синхронизируемая триггерами
+PG_SEARCH_DDL = [
+    """
+    ALTER TABLE article ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(summary, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_article_search_vector ON article USING GIN (search_vector)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS article_fts USING fts5(
+        title, summary, description,
+        content='article', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS article_fts_ai AFTER INSERT ON article BEGIN
+        INSERT INTO article_fts(rowid, title, summary, description)
+        VALUES (new.id, new.title, new.summary, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS article_fts_ad AFTER DELETE ON article BEGIN
+        INSERT INTO article_fts(article_fts, rowid, title, summary, description)
+        VALUES ('delete', old.id, old.title, old.summary, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS article_fts_au AFTER UPDATE ON article BEGIN
+        INSERT INTO article_fts(article_fts, rowid, title, summary, description)
+        VALUES ('delete', old.id, old.title, old.summary, old.description);
+        INSERT INTO article_fts(rowid, title, summary, description)
+        VALUES (new.id, new.title, new.summary, new.description);
+    END
+    """,
+]
+
+_article_fts = table('article_fts', column('rowid'), column('rank'))
+
+
+def ensure_search_index():
+    """Создает полнотекстовый индекс статей, если его еще нет (идемпотентно)"""
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        for ddl in PG_SEARCH_DDL:
+            db.session.execute(text(ddl))
+    elif dialect == 'sqlite':
+        # Триггеры пропадают вместе с таблицей article (drop_all), и тогда
+        # FTS-таблицу нужно перестроить по новому содержимому
+        has_triggers = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'article_fts_ai'"
+        )).first()
+        for ddl in SQLITE_SEARCH_DDL:
+            db.session.execute(text(ddl))
+        if not has_triggers:
+            db.session.execute(text("INSERT INTO article_fts(article_fts) VALUES ('rebuild')"))
+    else:
+        return
+
+    db.session.commit()
+
+
+def _fts5_query(q):
+    """Превращает пользовательский ввод в безопасный FTS5-запрос с поиском по префиксу"""
+    terms = re.findall(r'\w+', q)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_articles(q):
+    """Запрос статей по тексту q, отсортированный по релевантности.
+
+    Возвращает Query, который можно пагинировать как обычно. Для СУБД без
+    полнотекстового индекса остается прежний поиск через ILIKE.
+    """
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        ts_query = db.func.websearch_to_tsquery('russian', q)
+        search_vector = literal_column('article.search_vector')
+        return Article.query.filter(
+            search_vector.op('@@')(ts_query)
+        ).order_by(
+            db.func.ts_rank_cd(search_vector, ts_query).desc(),
+            Article.published_at.desc()
+        )
+
+    if dialect == 'sqlite':
+        fts_query = _fts5_query(q)
+        if not fts_query:
+            return Article.query.filter(false())
+        return Article.query.join(
+            _article_fts, _article_fts.c.rowid == Article.id
+        ).filter(
+            text("article_fts MATCH :fts_query").bindparams(fts_query=fts_query)
+        ).order_by(
+            _article_fts.c.rank,
+            Article.published_at.desc()
+        )
+
+    return Article.query.filter(
+        (Article.title.ilike(f"%{q}%")) |
+        (Article.summary.ilike(f"%{q}%")) |
+        (Article.description.ilike(f"%{q}%"))
+    ).order_by(
+        Article.url_to_image.isnot(None).desc(),
+        Article.published_at.desc()
+    )
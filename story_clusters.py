@@ -0,0 +1,216 @@
+# news_aggregator/story_clusters.py
+
+import hashlib
+import random
+import re
+import struct
+from datetime import timedelta
+from types import SimpleNamespace
+from sqlalchemy.orm import aliased
+from models import db, Article, DataVersion
+from config import Config
+
+# MinHash по основам слов заголовка: доля совпавших значений подписи оценивает
+# коэффициент Жаккара. LSH: подпись делится на BANDS полос по ROWS значений,
+# кандидаты - статьи хотя бы с одной совпавшей полосой
+NUM_HASHES = 64
+ROWS = 4
+BANDS = NUM_HASHES // ROWS
+MIN_SIMILARITY = 0.6
+MIN_TOKENS = 3
+
+# Грубая нормализация словоформ: "заявил", "заявила", "заявили" -> "заявил"
+STEM_LENGTH = 6
+STOP_WORDS = {
+    'и', 'в', 'во', 'на', 'с', 'со', 'по', 'из', 'к', 'от', 'для', 'о', 'об',
+    'а', 'но', 'да', 'или', 'что', 'как', 'не', 'за', 'до', 'при', 'это'
+}
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+_SIGNATURE = struct.Struct(f'>{NUM_HASHES}I')
+
+
+def title_tokens(title):
+    """Множество основ значимых слов заголовка"""
+    return {
+        word[:STEM_LENGTH]
+        for word in re.findall(r'\w+', (title or '').lower())
+        if word not in STOP_WORDS and len(word) > 1
+    }
+
+
+def story_signature(title):
+    """MinHash-подпись заголовка (bytes) или None для слишком коротких заголовков"""
+    tokens = title_tokens(title)
+    if len(tokens) < MIN_TOKENS:
+        return None
+
+    hashes = [
+        int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'big')
+        for token in tokens
+    ]
+    return _SIGNATURE.pack(*(
+        min((a * value + b) % _PRIME for value in hashes) & 0xFFFFFFFF
+        for a, b in _PERMUTATIONS
+    ))
+
+
+def similarity(signature_a, signature_b):
+    """Оценка коэффициента Жаккара по двум подписям"""
+    a = _SIGNATURE.unpack(signature_a)
+    b = _SIGNATURE.unpack(signature_b)
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+def _bands(signature):
+    return [
+        (band, signature[band * ROWS * 4:(band + 1) * ROWS * 4])
+        for band in range(BANDS)
+    ]
+
+
+class StoryIndex:
+    """LSH-индекс по полосам подписей: находит представителя сюжета для статьи"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._stories = {}
+
+    def add(self, article_id, signature, story_id=None):
+        self._stories[article_id] = (signature, story_id or article_id)
+        for band in _bands(signature):
+            self._buckets.setdefault(band, []).append(article_id)
+
+    def find(self, signature):
+        """Id представителя самого похожего сюжета или None"""
+        best = None
+        seen = set()
+        for band in _bands(signature):
+            for candidate in self._buckets.get(band, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                candidate_signature, story_id = self._stories[candidate]
+                score = similarity(signature, candidate_signature)
+                if score >= MIN_SIMILARITY and (best is None or score > best[0]):
+                    best = (score, story_id)
+        return best[1] if best else None
+
+
+def _story_windows(dates):
+    """Окна поиска кандидатов [дата - окно, дата + окно], слитые при перекрытии"""
+    window = timedelta(hours=Config.STORY_WINDOW_HOURS)
+    windows = []
+    for date in sorted(dates):
+        if windows and date - window <= windows[-1][1]:
+            windows[-1][1] = date + window
+        else:
+            windows.append([date - window, date + window])
+    return windows
+
+
+def assign_stories(articles):
+    """Относит новые статьи к сюжетам (без commit).
+
+    articles - объекты или строки с полями id, story_signature, published_at.
+    Кандидаты - статьи в пределах STORY_WINDOW_HOURS от даты каждой из новых
+    (окна соседних статей сливаются): одна старая статья в пачке не тянет
+    за собой все статьи с ее даты. Первая статья сюжета остается
+    представителем (story_id = NULL), у остальных story_id - id
+    представителя. Возвращает число статей, отнесенных к сюжетам.
+    """
+    articles = sorted(
+        (article for article in articles if article.story_signature),
+        key=lambda article: article.id
+    )
+    if not articles:
+        return 0
+
+    new_ids = {article.id for article in articles}
+    windows = _story_windows(article.published_at for article in articles)
+    recent = db.session.query(
+        Article.id, Article.story_signature, Article.story_id
+    ).filter(
+        db.or_(*(Article.published_at.between(start, end) for start, end in windows)),
+        Article.story_signature.isnot(None)
+    ).all()
+
+    index = StoryIndex()
+    for row in recent:
+        if row.id not in new_ids:
+            index.add(row.id, row.story_signature, row.story_id)
+
+    mappings = []
+    for article in articles:
+        story_id = index.find(article.story_signature)
+        index.add(article.id, article.story_signature, story_id)
+        if story_id is not None:
+            mappings.append({'id': article.id, 'story_id': story_id})
+
+    if mappings:
+        db.session.bulk_update_mappings(Article, mappings)
+    return len(mappings)
+
+
+def backfill_stories(batch_size=500):
+    """Считает подписи и сюжеты для статей, загруженных до кластеризации"""
+    processed = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            Article.id, Article.title, Article.published_at
+        ).filter(
+            Article.story_signature.is_(None),
+            Article.id > last_id
+        ).order_by(Article.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        signed = [
+            SimpleNamespace(id=row.id, story_signature=story_signature(row.title),
+                            published_at=row.published_at)
+            for row in rows
+        ]
+        db.session.bulk_update_mappings(Article, [
+            {'id': item.id, 'story_signature': item.story_signature}
+            for item in signed if item.story_signature
+        ])
+        db.session.flush()
+        assign_stories(signed)
+        DataVersion.bump()
+        db.session.commit()
+
+        processed += len(rows)
+        last_id = rows[-1].id
+        print(f"🧩 Сюжеты посчитаны для {processed} статей")
+    return processed
+
+
+def release_stories(article_ids):
+    """Перед удалением представителей делает их дубликаты самостоятельными
+    (SQLite не применяет ON DELETE SET NULL по умолчанию)"""
+    db.session.query(Article).filter(
+        Article.story_id.in_(article_ids)
+    ).update({Article.story_id: None}, synchronize_session=False)
+
+
+def collapse_stories(query, source_ids=None):
+    """Оставляет в запросе по одной статье на сюжет (если COLLAPSE_STORIES).
+
+    Без фильтра по источникам показываются только представители. С фильтром
+    дубликат показывается, если представитель его сюжета не из выбранных
+    источников - иначе сюжет пропал бы из ленты целиком.
+    """
+    if not Config.COLLAPSE_STORIES:
+        return query
+    if not source_ids:
+        return query.filter(Article.story_id.is_(None))
+
+    representative = aliased(Article)
+    in_scope = db.session.query(representative.id).filter(
+        representative.id == Article.story_id,
+        representative.source_id.in_(source_ids)
+    ).exists()
+    return query.filter(db.or_(Article.story_id.is_(None), ~in_scope))
@@ -1,14 +1,189 @@
-import nltk
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lsa import LsaSummarizer
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+
+# Ресурсы NLTK, нужные токенизатору sumy: (имя пакета, путь в nltk_data)
+NLTK_RESOURCES = [
+    ('punkt', 'tokenizers/punkt'),
+    ('punkt_tab', 'tokenizers/punkt_tab'),
+]
+
+# Токенизатор и суммаризатор переиспользуются в пределах процесса
+_tokenizer = None
+_summarizer = None
+_init_lock = threading.Lock()
+_nltk_ready = False
+# Ресурсы не нашлись и не скачались: не повторяем попытку на каждой статье
+_nltk_failed = None
+
+# Пул процессов живет весь процесс: каждая пачка конвейера загрузки не
+# поднимает заново процессы с токенизатором
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def ensure_nltk_data(allow_download=None):
+    """Находит токенизаторы NLTK при первом использовании.
+
+    Сначала ищет в локальном каталоге NLTK_DATA_DIR и стандартных путях NLTK;
+    скачивает недостающее в NLTK_DATA_DIR только если разрешено
+    (allow_download, по умолчанию NLTK_AUTO_DOWNLOAD). Импорт модуля сеть не трогает.
+    Неудача запоминается до конца процесса: следующие вызовы сразу выбрасывают
+    ту же ошибку; явный allow_download=True (flask nltk-warmup) пробует снова.
+    """
+    global _nltk_ready, _nltk_failed
+    if _nltk_ready:
+        return
+    if _nltk_failed is not None and allow_download is not True:
+        raise _nltk_failed
+
+    if allow_download is None:
+        allow_download = Config.NLTK_AUTO_DOWNLOAD
+
+    import nltk
+
+    data_dir = Config.NLTK_DATA_DIR
+    if data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+
+    try:
+        for name, path in NLTK_RESOURCES:
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                if not allow_download:
+                    raise LookupError(
+                        f"Ресурс NLTK '{name}' не найден в {data_dir}; "
+                        f"выполните 'flask nltk-warmup' при доступной сети"
+                    )
+                os.makedirs(data_dir, exist_ok=True)
+                if not nltk.download(name, download_dir=data_dir, quiet=True):
+                    raise LookupError(f"Не удалось скачать ресурс NLTK '{name}'")
+    except Exception as e:
+        _nltk_failed = e if isinstance(e, LookupError) else LookupError(str(e))
+        print(f"⚠️  Суммаризация недоступна: {_nltk_failed}")
+        raise _nltk_failed
+
+    _nltk_failed = None
+    _nltk_ready = True
+
+
+def _get_summarizer():
+    global _tokenizer, _summarizer
+    if _summarizer is None:
+        with _init_lock:
+            if _summarizer is None:
+                ensure_nltk_data()
+                from sumy.nlp.tokenizers import Tokenizer
+                from sumy.summarizers.lsa import LsaSummarizer
+                _tokenizer = Tokenizer("russian")
+                _summarizer = LsaSummarizer()
+    return _tokenizer, _summarizer
+
+
+def warm_up(allow_download=None):
+    """Готовит ресурсы NLTK и суммаризатор заранее.
+
+    Вызывается один раз до fork (хук gunicorn on_starting, init_db), чтобы
+    воркеры унаследовали готовый токенизатор и не платили за него сами.
+    """
+    ensure_nltk_data(allow_download)
+    _get_summarizer()
 
-# Грузим токенизаторы (один раз)
-nltk.download("punkt")
-nltk.download("punkt_tab")
 
 def summarize_text(text, sentences_count=2):
-    parser = PlaintextParser.from_string(text, Tokenizer("russian"))
-    summarizer = LsaSummarizer()
+    from sumy.parsers.plaintext import PlaintextParser
+
+    tokenizer, summarizer = _get_summarizer()
+    parser = PlaintextParser.from_string(text, tokenizer)
     summary = summarizer(parser.document, sentences_count)
-    return " ".join(str(sentence) for sentence in summary)
\ No newline at end of file
+    return " ".join(str(sentence) for sentence in summary)
+
+
+def _init_worker():
+    """Инициализатор процесса пула: ошибка не должна ломать весь пул"""
+    try:
+        _get_summarizer()
+    except Exception as e:
+        print(f"⚠️  Не удалось подготовить суммаризатор: {e}")
+
+
+def _summarize_job(job):
+    """Задача для пула: (text, sentences_count) -> сводка или None при ошибке"""
+    text, sentences_count = job
+    try:
+        return summarize_text(text, sentences_count)
+    except Exception:
+        return None
+
+
+def get_pool(workers=None):
+    """Общий пул процессов суммаризации на workers процессов.
+
+    Создается при первом вызове и живет до выхода; запрос другого размера
+    пересоздает пул. Процессы запускаются через forkserver (где он есть) или
+    spawn: fork из многопоточного процесса с открытыми соединениями к БД
+    небезопасен. Ресурсы NLTK проверяются (и при разрешении скачиваются)
+    здесь, в родителе, - иначе каждый процесс пула качал бы их в один
+    каталог одновременно; без ресурсов - LookupError.
+    """
+    global _pool, _pool_workers
+    ensure_nltk_data()
+    with _pool_lock:
+        if _pool is not None and _pool_workers != workers:
+            _pool.shutdown()
+            _pool = None
+        if _pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() \
+                else 'spawn'
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                mp_context=multiprocessing.get_context(method)
+            )
+            _pool_workers = workers
+        return _pool
+
+
+@atexit.register
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def summarize_many(jobs, workers=None, chunksize=8, pool=None):
+    """Суммаризирует список (text, sentences_count) на пуле процессов.
+
+    pool - готовый пул; по умолчанию общий пул процесса (get_pool), каждый
+    процесс которого один раз создает Tokenizer и LsaSummarizer. Если процесс
+    пула умер (OOM, падение в нативном коде), пул пересоздается и пачка
+    повторяется один раз, затем считается в текущем процессе.
+    Возвращает сводки в порядке jobs; None - если текст не удалось обработать
+    (в том числе для всех, если нет ресурсов NLTK).
+    """
+    jobs = list(jobs)
+    if workers == 1 or len(jobs) < 2:
+        return [_summarize_job(job) for job in jobs]
+
+    try:
+        pool = pool or get_pool(workers)
+        for attempt in range(2):
+            try:
+                return list(pool.map(_summarize_job, jobs, chunksize=chunksize))
+            except BrokenProcessPool as e:
+                print(f"⚠️  Пул суммаризации сломан: {e}")
+                shutdown_pool()
+                if attempt == 0:
+                    pool = get_pool(workers)
+    except LookupError:
+        return [None] * len(jobs)
+
+    print("⚠️  Суммаризируем пачку без пула процессов")
+    return [_summarize_job(job) for job in jobs]
@@ -0,0 +1,103 @@
+# news_aggregator/summary_cache.py
+
+import hashlib
+import re
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from models import db, SummaryCache
+from summarizer import summarize_many
+from config import Config
+
+
+def normalize_text(text):
+    """Нормализует текст для ключа кэша: схлопывает пробелы и переводы строк"""
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+
+def cache_key(text, sentences_count):
+    normalized = normalize_text(text)
+    return hashlib.sha256(f"{sentences_count}:{normalized}".encode('utf-8')).hexdigest()
+
+
+def get_cached_summaries(keys):
+    """Возвращает словарь key -> summary для найденных ключей одним запросом
+    и отмечает их использование (для вытеснения давно не нужных записей)."""
+    keys = list(set(keys))
+    if not keys:
+        return {}
+
+    rows = db.session.query(SummaryCache.key, SummaryCache.summary).filter(
+        SummaryCache.key.in_(keys)
+    ).all()
+    found = {row.key: row.summary for row in rows}
+
+    if found:
+        SummaryCache.query.filter(SummaryCache.key.in_(list(found))).update(
+            {
+                SummaryCache.hits: SummaryCache.hits + 1,
+                SummaryCache.last_used_at: datetime.utcnow()
+            },
+            synchronize_session=False
+        )
+    return found
+
+
+def store_summaries(summaries):
+    """Сохраняет словарь key -> summary; запись в кэш best-effort"""
+    if not summaries:
+        return
+
+    now = datetime.utcnow()
+    try:
+        with db.session.begin_nested():
+            db.session.bulk_insert_mappings(SummaryCache, [
+                {'key': key, 'summary': summary, 'hits': 0,
+                 'created_at': now, 'last_used_at': now}
+                for key, summary in summaries.items()
+            ])
+    except IntegrityError:
+        # Тот же текст успел закэшировать параллельный процесс
+        pass
+
+
+def evict_summaries(max_entries=None):
+    """Удаляет давно не использованные записи сверх лимита, возвращает их число"""
+    max_entries = max_entries or Config.SUMMARY_CACHE_MAX_ENTRIES
+    excess = SummaryCache.query.count() - max_entries
+    if excess <= 0:
+        return 0
+
+    oldest = db.session.query(SummaryCache.key).order_by(
+        SummaryCache.last_used_at.asc()
+    ).limit(excess).subquery()
+    deleted = SummaryCache.query.filter(
+        SummaryCache.key.in_(db.select(oldest.c.key))
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def cached_summarize(jobs, workers=None):
+    """summarize_many с кэшем: повторы (в кэше и внутри пачки) не пересчитываются.
+
+    jobs - список (text, sentences_count). Возвращает сводки в порядке jobs,
+    None - если текст не удалось обработать. Коммит остается за вызывающим.
+    """
+    jobs = list(jobs)
+    keys = [cache_key(text, count) for text, count in jobs]
+    known = get_cached_summaries(keys)
+
+    # Каждый уникальный текст-промах считаем один раз
+    missing = {}
+    for key, job in zip(keys, jobs):
+        if key not in known and key not in missing:
+            missing[key] = job
+
+    if missing:
+        computed = summarize_many(list(missing.values()), workers=workers)
+        fresh = {key: summary for key, summary in zip(missing, computed) if summary is not None}
+        store_summaries(fresh)
+        known.update(fresh)
+
+    print(f"🗃️  Кэш сводок: {len(jobs) - len(missing)} из {len(jobs)} без пересчета")
+    return [known.get(key) for key in keys]
@@ -1,78 +1,138 @@
 # news_aggregator/summary_generator.py - ПОЛНАЯ ВЕРСИЯ
 
 import re
+import numpy as np
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from models import Article
+from keyword_matcher import KeywordMatcher
+import article_stats
+
+
+# Ключевые слова для каждой темы
+TOPIC_KEYWORDS = {
+    'politics': {
+        'keywords': ['путин', 'президент', 'правительство', 'госдума', 'министр',
+                     'депутат', 'парламент', 'закон', 'указ', 'выборы', 'партия',
+                     'политика', 'государство', 'власть', 'регион', 'губернатор'],
+        'weight': 1.0
+    },
+    'technology': {
+        'keywords': ['технология', 'цифровой', 'интернет', 'компьютер', 'софт',
+                     'приложение', 'стартап', 'инновация', 'искусственный интеллект',
+                     'ai', 'программное обеспечение', 'гаджет', 'смартфон', 'робот',
+                     'данные', 'кибер', 'облако', 'блокчейн'],
+        'weight': 1.0
+    },
+    'economy': {
+        'keywords': ['рубль', 'доллар', 'экономика', 'инфляция', 'банк', 'нефть',
+                     'газ', 'цена', 'рост', 'падение', 'ввп', 'бизнес', 'финансы',
+                     'инвестиции', 'акции', 'биржа', 'торговля', 'экспорт', 'импорт',
+                     'промышленность', 'производство'],
+        'weight': 1.0
+    },
+    'sports': {
+        'keywords': ['футбол', 'хоккей', 'олимпиада', 'чемпионат', 'матч', 'игра',
+                     'команда', 'спортсмен', 'тренер', 'победа', 'поражение', 'гол',
+                     'спорт', 'турнир', 'лига', 'кубок', 'соревнование', 'атлет'],
+        'weight': 1.0
+    },
+    'culture': {
+        'keywords': ['театр', 'кино', 'музыка', 'художник', 'фестиваль', 'концерт',
+                     'выставка', 'книга', 'литература', 'искусство', 'культура',
+                     'актер', 'режиссер', 'писатель', 'музей', 'галерея', 'премия'],
+        'weight': 1.0
+    },
+    'science': {
+        'keywords': ['исследование', 'ученый', 'открытие', 'эксперимент', 'медицина',
+                     'лечение', 'вакцина', 'наука', 'научный', 'космос', 'физика',
+                     'химия', 'биология', 'генетика', 'клиника', 'больница', 'врач'],
+        'weight': 1.0
+    },
+    'world': {
+        'keywords': ['сша', 'китай', 'европа', 'украина', 'санкции', 'переговоры',
+                     'соглашение', 'договор', 'страна', 'международный', 'мир',
+                     'конфликт', 'война', 'мирный', 'дипломатия', 'визит'],
+        'weight': 1.0
+    },
+    'society': {
+        'keywords': ['общество', 'люди', 'город', 'регион', 'жители', 'социальный',
+                     'образование', 'школа', 'университет', 'студент', 'учитель',
+                     'пенсия', 'зарплата', 'работа', 'безработица', 'демография'],
+        'weight': 1.0
+    },
+    'incidents': {
+        'keywords': ['авария', 'пожар', 'взрыв', 'катастрофа', 'происшествие', 'чп',
+                     'спасение', 'жертвы', 'пострадавшие', 'эвакуация', 'мчс',
+                     'полиция', 'следствие', 'преступление', 'суд'],
+        'weight': 1.0
+    }
+}
+
+
+# Темы для раздела "основные темы" в сводке
+ANALYSIS_TOPIC_KEYWORDS = {
+    'Политика': ['путин', 'президент', 'правительство', 'госдума', 'министр', 'депутат', 'парламент', 'закон',
+                 'указ'],
+    'Экономика': ['рубль', 'доллар', 'экономика', 'инфляция', 'банк', 'нефть', 'газ', 'цена', 'рост', 'падение',
+                  'ввп'],
+    'Международные отношения': ['сша', 'китай', 'европа', 'украина', 'санкции', 'переговоры', 'соглашение',
+                                'договор'],
+    'Технологии': ['технология', 'цифровой', 'интернет', 'компьютер', 'софт', 'приложение', 'стартап', 'инновация'],
+    'Спорт': ['футбол', 'хоккей', 'олимпиада', 'чемпионат', 'матч', 'игра', 'команда', 'спортсмен'],
+    'Культура': ['театр', 'кино', 'музыка', 'художник', 'фестиваль', 'концерт', 'выставка', 'книга'],
+    'Наука': ['исследование', 'ученый', 'открытие', 'эксперимент', 'медицина', 'лечение', 'вакцина'],
+    'Происшествия': ['авария', 'пожар', 'взрыв', 'катастрофа', 'происшествие', 'чп', 'спасение']
+}
+
+# Слова-индикаторы важных событий
+IMPORTANT_INDICATORS = [
+    'объявил', 'заявил', 'сообщил', 'принял решение', 'подписал',
+    'запретил', 'разрешил', 'одобрил', 'отклонил', 'утвердил',
+    'началось', 'завершилось', 'произошло', 'случилось',
+    'увеличил', 'снизил', 'повысил', 'понизил',
+    'встретился', 'переговоры', 'соглашение', 'договор'
+]
+
+# Критерии важности статьи
+IMPORTANCE_KEYWORDS = [
+    'путин', 'президент', 'правительство', 'россия', 'российский',
+    'экстренно', 'срочно', 'важно', 'официально', 'первый',
+    'главный', 'крупный', 'масштабный', 'серьезный',
+    'рекордный', 'исторический', 'уникальный'
+]
+
+# Все таблицы ключевых слов ищутся одним автоматом за один проход по тексту
+KEYWORD_TABLES = (
+    [keyword for config in TOPIC_KEYWORDS.values() for keyword in config['keywords']],
+    [keyword for keywords in ANALYSIS_TOPIC_KEYWORDS.values() for keyword in keywords],
+    IMPORTANT_INDICATORS,
+    IMPORTANCE_KEYWORDS,
+)
+KEYWORD_MATCHER = KeywordMatcher(keyword for table in KEYWORD_TABLES for keyword in table)
+
+
+def score_topics(title, description=None, summary=None):
+    """Считает совпадения ключевых слов по каждой теме, возвращает только ненулевые"""
+    full_text = f"{title} {description or ''} {summary or ''}".lower()
+
+    counts = KEYWORD_MATCHER.count(full_text)
+
+    scores = {}
+    for topic, config in TOPIC_KEYWORDS.items():
+        matches = sum(counts.get(keyword, 0) for keyword in config['keywords'])
+        if matches > 0:
+            scores[topic] = matches
+    return scores
 
 
 def filter_articles_by_topic(articles, topic):
     """Фильтрует статьи по заданной теме"""
 
-    # Определяем ключевые слова для каждой темы
-    topic_keywords = {
-        'politics': {
-            'keywords': ['путин', 'президент', 'правительство', 'госдума', 'министр',
-                         'депутат', 'парламент', 'закон', 'указ', 'выборы', 'партия',
-                         'политика', 'государство', 'власть', 'регион', 'губернатор'],
-            'weight': 1.0
-        },
-        'technology': {
-            'keywords': ['технология', 'цифровой', 'интернет', 'компьютер', 'софт',
-                         'приложение', 'стартап', 'инновация', 'искусственный интеллект',
-                         'ai', 'программное обеспечение', 'гаджет', 'смартфон', 'робот',
-                         'данные', 'кибер', 'облако', 'блокчейн'],
-            'weight': 1.0
-        },
-        'economy': {
-            'keywords': ['рубль', 'доллар', 'экономика', 'инфляция', 'банк', 'нефть',
-                         'газ', 'цена', 'рост', 'падение', 'ввп', 'бизнес', 'финансы',
-                         'инвестиции', 'акции', 'биржа', 'торговля', 'экспорт', 'импорт',
-                         'промышленность', 'производство'],
-            'weight': 1.0
-        },
-        'sports': {
-            'keywords': ['футбол', 'хоккей', 'олимпиада', 'чемпионат', 'матч', 'игра',
-                         'команда', 'спортсмен', 'тренер', 'победа', 'поражение', 'гол',
-                         'спорт', 'турнир', 'лига', 'кубок', 'соревнование', 'атлет'],
-            'weight': 1.0
-        },
-        'culture': {
-            'keywords': ['театр', 'кино', 'музыка', 'художник', 'фестиваль', 'концерт',
-                         'выставка', 'книга', 'литература', 'искусство', 'культура',
-                         'актер', 'режиссер', 'писатель', 'музей', 'галерея', 'премия'],
-            'weight': 1.0
-        },
-        'science': {
-            'keywords': ['исследование', 'ученый', 'открытие', 'эксперимент', 'медицина',
-                         'лечение', 'вакцина', 'наука', 'научный', 'космос', 'физика',
-                         'химия', 'биология', 'генетика', 'клиника', 'больница', 'врач'],
-            'weight': 1.0
-        },
-        'world': {
-            'keywords': ['сша', 'китай', 'европа', 'украина', 'санкции', 'переговоры',
-                         'соглашение', 'договор', 'страна', 'международный', 'мир',
-                         'конфликт', 'война', 'мирный', 'дипломатия', 'визит'],
-            'weight': 1.0
-        },
-        'society': {
-            'keywords': ['общество', 'люди', 'город', 'регион', 'жители', 'социальный',
-                         'образование', 'школа', 'университет', 'студент', 'учитель',
-                         'пенсия', 'зарплата', 'работа', 'безработица', 'демография'],
-            'weight': 1.0
-        },
-        'incidents': {
-            'keywords': ['авария', 'пожар', 'взрыв', 'катастрофа', 'происшествие', 'чп',
-                         'спасение', 'жертвы', 'пострадавшие', 'эвакуация', 'мчс',
-                         'полиция', 'следствие', 'преступление', 'суд'],
-            'weight': 1.0
-        }
-    }
-
-    if topic not in topic_keywords:
+    if topic not in TOPIC_KEYWORDS:
         return articles
 
-    keywords = topic_keywords[topic]['keywords']
+    keywords = TOPIC_KEYWORDS[topic]['keywords']
     filtered_articles = []
 
     # Фильтруем статьи по ключевым словам
@@ -81,7 +141,7 @@ def filter_articles_by_topic(articles, topic):
         full_text = f"{article.title} {article.description or ''} {article.summary or ''}".lower()
 
         # Подсчитываем количество совпадений
-        matches = sum(full_text.count(keyword) for keyword in keywords)
+        matches = KEYWORD_MATCHER.total(full_text, keywords)
 
         # Если есть хотя бы 1 совпадение, добавляем статью
         if matches > 0:
@@ -94,32 +154,47 @@ def filter_articles_by_topic(articles, topic):
     return [article for article, _ in filtered_articles[:15]]
 
 
-def generate_news_summary(articles, max_articles=5, topic=None):
-    """Генерирует краткую выжимку из топ новостей (обновленная версия)"""
+def generate_news_summary(articles, max_articles=5, topic=None, scope=None):
+    """Генерирует краткую выжимку из топ новостей (обновленная версия).
+
+    scope - id всех статей выжимки (список или подзапрос) для статистики по
+    источникам и дате; тогда в articles достаточно самых свежих max_articles.
+    По умолчанию статистика считается по articles.
+    """
 
     if not articles:
         return {
             'summary': 'Новости не найдены.',
             'top_articles': [],
-            'generated_at': datetime.now()
+            'generated_at': datetime.now(),
+            'statistics': article_stats.statistics_from({}, 0)
         }
 
     # Берем топ статей и анализируем их
     top_articles = sorted(articles, key=lambda x: x.published_at, reverse=True)[:max_articles]
 
+    # Агрегаты по источникам и за сегодня - один раз для текста и статистики
+    if scope is None:
+        scope = _article_ids(articles)
+    sources_stats = article_stats.source_counts(scope)
+    today_articles = article_stats.today_count(scope) if sources_stats else 0
+
     # Создаем выжимку с учетом темы
-    summary_text = create_intelligent_summary(top_articles, articles, topic)
+    summary_text = create_intelligent_summary(
+        top_articles, articles, topic, sources_stats=sources_stats, today_count=today_articles
+    )
 
     # Подготавливаем данные статей
+    importance = calculate_importance_batch(top_articles, now=datetime.now())
     article_links = []
-    for article in top_articles:
+    for article, score in zip(top_articles, importance):
         article_links.append({
             'id': article.id,
             'title': article.title,
             'url': article.url,
             'source': article.source.name,
             'published_at': article.published_at,
-            'importance_score': calculate_article_importance(article)
+            'importance_score': int(score)
         })
 
     # Сортируем по важности
@@ -128,12 +203,18 @@ def generate_news_summary(articles, max_articles=5, topic=None):
     return {
         'summary': summary_text,
         'top_articles': article_links,
-        'generated_at': datetime.now()
+        'generated_at': datetime.now(),
+        'statistics': article_stats.statistics_from(sources_stats, today_articles)
     }
 
 
-def create_intelligent_summary(top_articles, all_articles, topic=None):
-    """Создает умную выжимку на основе анализа текста (обновленная версия)"""
+def create_intelligent_summary(top_articles, all_articles, topic=None,
+                               sources_stats=None, today_count=None):
+    """Создает умную выжимку на основе анализа текста (обновленная версия).
+
+    sources_stats и today_count - уже посчитанные analyze_sources и число
+    статей за сегодня; без них считаются здесь.
+    """
 
     # Названия тем на русском
     topic_names = {
@@ -148,9 +229,9 @@ def create_intelligent_summary(top_articles, all_articles, topic=None):
         'incidents': 'Происшествия'
     }
 
-    # Анализируем темы и тренды
-    sources_stats = analyze_sources(all_articles)
-    time_stats = analyze_time_distribution(all_articles)
+    # Анализируем источники (агрегат в БД по id статей)
+    if sources_stats is None:
+        sources_stats = analyze_sources(all_articles)
 
     # Находим ключевые события
     key_events = extract_key_events(top_articles)
@@ -164,13 +245,13 @@ def create_intelligent_summary(top_articles, all_articles, topic=None):
         summary_parts.append(f"Выжимка по теме '{topic_name}'")
 
     # Временная статистика
-    today = datetime.now().date()
-    today_count = len([a for a in all_articles if a.published_at.date() == today])
+    if today_count is None:
+        today_count = article_stats.today_count(_article_ids(all_articles))
 
     if today_count > 0:
         summary_parts.append(f"За сегодня опубликовано {today_count} новостей")
     else:
-        summary_parts.append(f"В последние дни опубликовано {len(all_articles)} новостей")
+        summary_parts.append(f"В последние дни опубликовано {sum(sources_stats.values())} новостей")
 
     # Основные источники
     top_sources = list(sources_stats.keys())[:3]
@@ -190,21 +271,6 @@ def create_intelligent_summary(top_articles, all_articles, topic=None):
 def analyze_topics(articles):
     """Анализирует основные темы в новостях"""
 
-    # Ключевые слова по темам
-    topic_keywords = {
-        'Политика': ['путин', 'президент', 'правительство', 'госдума', 'министр', 'депутат', 'парламент', 'закон',
-                     'указ'],
-        'Экономика': ['рубль', 'доллар', 'экономика', 'инфляция', 'банк', 'нефть', 'газ', 'цена', 'рост', 'падение',
-                      'ввп'],
-        'Международные отношения': ['сша', 'китай', 'европа', 'украина', 'санкции', 'переговоры', 'соглашение',
-                                    'договор'],
-        'Технологии': ['технология', 'цифровой', 'интернет', 'компьютер', 'софт', 'приложение', 'стартап', 'инновация'],
-        'Спорт': ['футбол', 'хоккей', 'олимпиада', 'чемпионат', 'матч', 'игра', 'команда', 'спортсмен'],
-        'Культура': ['театр', 'кино', 'музыка', 'художник', 'фестиваль', 'концерт', 'выставка', 'книга'],
-        'Наука': ['исследование', 'ученый', 'открытие', 'эксперимент', 'медицина', 'лечение', 'вакцина'],
-        'Происшествия': ['авария', 'пожар', 'взрыв', 'катастрофа', 'происшествие', 'чп', 'спасение']
-    }
-
     topics = defaultdict(list)
 
     for article in articles:
@@ -212,9 +278,10 @@ def analyze_topics(articles):
         full_text = f"{article.title} {article.description or ''} {article.summary or ''}".lower()
 
         # Определяем тему статьи
+        counts = KEYWORD_MATCHER.count(full_text)
         topic_scores = {}
-        for topic, keywords in topic_keywords.items():
-            score = sum(full_text.count(keyword) for keyword in keywords)
+        for topic, keywords in ANALYSIS_TOPIC_KEYWORDS.items():
+            score = sum(counts.get(keyword, 0) for keyword in keywords)
             if score > 0:
                 topic_scores[topic] = score
 
@@ -229,65 +296,34 @@ def analyze_topics(articles):
     return dict(sorted(topics.items(), key=lambda x: len(x[1]), reverse=True))
 
 
+def _article_ids(articles):
+    return [article.id for article in articles]
+
+
 def analyze_sources(articles):
     """Анализирует статистику по источникам"""
-    sources = Counter([article.source.name for article in articles])
-    return dict(sources.most_common())
+    return article_stats.source_counts(_article_ids(articles))
 
 
 def analyze_time_distribution(articles):
     """Анализирует временное распределение новостей"""
-    now = datetime.now()
-    time_buckets = {
-        'Последний час': 0,
-        'Последние 3 часа': 0,
-        'Сегодня': 0,
-        'Вчера': 0,
-        'Раньше': 0
-    }
-
-    for article in articles:
-        time_diff = now - article.published_at
-
-        if time_diff.total_seconds() < 3600:  # 1 час
-            time_buckets['Последний час'] += 1
-        elif time_diff.total_seconds() < 3600 * 3:  # 3 часа
-            time_buckets['Последние 3 часа'] += 1
-        elif time_diff.days == 0:  # сегодня
-            time_buckets['Сегодня'] += 1
-        elif time_diff.days == 1:  # вчера
-            time_buckets['Вчера'] += 1
-        else:
-            time_buckets['Раньше'] += 1
-
-    return time_buckets
+    return article_stats.time_distribution(_article_ids(articles))
 
 
 def extract_key_events(articles):
     """Извлекает ключевые события из новостей"""
 
-    # Слова-индикаторы важных событий
-    important_indicators = [
-        'объявил', 'заявил', 'сообщил', 'принял решение', 'подписал',
-        'запретил', 'разрешил', 'одобрил', 'отклонил', 'утвердил',
-        'началось', 'завершилось', 'произошло', 'случилось',
-        'увеличил', 'снизил', 'повысил', 'понизил',
-        'встретился', 'переговоры', 'соглашение', 'договор'
-    ]
-
     key_events = []
 
     for article in articles[:3]:  # Берем топ-3 статьи
-        title = article.title.lower()
+        counts = KEYWORD_MATCHER.count(article.title.lower())
 
         # Проверяем наличие индикаторов важности
-        for indicator in important_indicators:
-            if indicator in title:
-                # Извлекаем ключевую фразу
-                event = extract_key_phrase(article.title)
-                if event and len(event) > 10:
-                    key_events.append(event)
-                break
+        if any(indicator in counts for indicator in IMPORTANT_INDICATORS):
+            # Извлекаем ключевую фразу
+            event = extract_key_phrase(article.title)
+            if event and len(event) > 10:
+                key_events.append(event)
 
     return "; ".join(key_events[:2])  # Максимум 2 события
 
@@ -308,28 +344,22 @@ def extract_key_phrase(title):
     return ' '.join(filtered_words[:8])
 
 
-def calculate_article_importance(article):
+def calculate_article_importance(article, now=None):
     """Вычисляет важность статьи"""
 
     score = 0
     title = article.title.lower()
     description = (article.description or '').lower()
 
-    # Критерии важности
-    importance_keywords = [
-        'путин', 'президент', 'правительство', 'россия', 'российский',
-        'экстренно', 'срочно', 'важно', 'официально', 'первый',
-        'главный', 'крупный', 'масштабный', 'серьезный',
-        'рекордный', 'исторический', 'уникальный'
-    ]
-
     # Бонус за ключевые слова
-    for keyword in importance_keywords:
-        score += title.count(keyword) * 3
-        score += description.count(keyword) * 1
+    title_counts = KEYWORD_MATCHER.count(title)
+    description_counts = KEYWORD_MATCHER.count(description)
+    for keyword in IMPORTANCE_KEYWORDS:
+        score += title_counts.get(keyword, 0) * 3
+        score += description_counts.get(keyword, 0) * 1
 
     # Бонус за свежесть
-    time_diff = datetime.now() - article.published_at
+    time_diff = (now or datetime.now()) - article.published_at
     if time_diff.total_seconds() < 3600:  # менее часа
         score += 5
     elif time_diff.total_seconds() < 3600 * 6:  # менее 6 часов
@@ -349,6 +379,59 @@ def calculate_article_importance(article):
     return max(0, score)
 
 
+def calculate_importance_batch(articles, now=None):
+    """Важность для списка статей, результат совпадает с calculate_article_importance.
+
+    Все статьи оцениваются относительно одного момента now, составляющие
+    (ключевые слова, свежесть, длина заголовка) считаются массивами NumPy.
+    """
+    articles = list(articles)
+    return importance_scores(
+        [article.title for article in articles],
+        [article.description for article in articles],
+        [article.published_at for article in articles],
+        now
+    )
+
+
+def importance_scores(titles, descriptions, published_at, now=None):
+    """Векторная оценка важности по колонкам заголовков, описаний и дат.
+
+    Возвращает np.ndarray целых очков в порядке входных данных.
+    """
+    count = len(titles)
+    if not count:
+        return np.zeros(0, dtype=np.int64)
+
+    title_hits = np.empty(count, dtype=np.int64)
+    description_hits = np.empty(count, dtype=np.int64)
+    title_lengths = np.empty(count, dtype=np.int64)
+
+    for row, (title, description) in enumerate(zip(titles, descriptions)):
+        title_hits[row] = KEYWORD_MATCHER.total(title.lower(), IMPORTANCE_KEYWORDS)
+        description_hits[row] = KEYWORD_MATCHER.total((description or '').lower(), IMPORTANCE_KEYWORDS)
+        title_lengths[row] = len(title.split())
+
+    # Ключевые слова: в заголовке весят 3, в описании 1
+    scores = title_hits * 3 + description_hits
+
+    # Свежесть: разница в микросекундах с одним опорным временем
+    reference = np.datetime64(now or datetime.now(), 'us')
+    age = (reference - np.array(published_at, dtype='datetime64[us]')).astype(np.int64)
+    hour = 3600 * 10 ** 6
+    scores += np.select(
+        [age < hour, age < hour * 6, age < hour * 24],
+        [5, 3, 1],
+        default=0
+    )
+
+    # Длина заголовка
+    scores += np.where((title_lengths >= 5) & (title_lengths <= 12), 2, 0)
+    scores -= np.where((title_lengths < 3) | (title_lengths > 20), 1, 0)
+
+    return np.maximum(scores, 0)
+
+
 def create_trending_summary(articles):
     """Создает выжимку на основе трендов"""
 
@@ -382,26 +465,7 @@ def create_trending_summary(articles):
 
 def get_summary_statistics(articles):
     """Возвращает статистику для отображения"""
-
-    if not articles:
-        return {
-            'total_articles': 0,
-            'today_articles': 0,
-            'sources_count': 0,
-            'top_source': 'Нет данных'
-        }
-
-    today = datetime.now().date()
-    today_articles = [a for a in articles if a.published_at.date() == today]
-    sources = set([a.source.name for a in articles])
-    source_counts = Counter([a.source.name for a in articles])
-
-    return {
-        'total_articles': len(articles),
-        'today_articles': len(today_articles),
-        'sources_count': len(sources),
-        'top_source': source_counts.most_common(1)[0][0] if source_counts else 'Нет данных'
-    }
+    return article_stats.summary_statistics(_article_ids(articles))
 
 
 def create_experimental_summary(articles):
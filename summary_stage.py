@@ -0,0 +1,103 @@
+# news_aggregator/summary_stage.py
+
+import re
+from models import db, Article, DataVersion
+from summary_cache import cached_summarize, evict_summaries
+from cache import invalidate_article_caches
+from topic_index import index_topics_for_ids
+from config import Config
+
+
+def summary_input(title, description, content):
+    """Текст и число предложений для сводки статьи.
+
+    Статьи NewsAPI приходят с content и суммаризируются по полному тексту
+    в 2 предложения, статьи RSS - по описанию без HTML в 1 предложение.
+    """
+    if content:
+        full_text = ' '.join([part for part in [title, description, content] if part])
+        return full_text, 2
+
+    clean_desc = re.sub(r'<[^>]+>', '', description or '')
+    return clean_desc, 1
+
+
+def fallback_summary(description):
+    """Сводка на случай ошибки суммаризации"""
+    if not description:
+        return ""
+    return description[:200] + "..." if len(description) > 200 else description
+
+
+def summarize_pending_articles(limit=None, workers=None, batch_size=None, ids=None):
+    """Заполняет Article.summary для уже сохраненных статей без сводки.
+
+    ids - ограничить обработку этими статьями (стадия конвейера загрузки
+    передает только что записанную пачку).
+
+    Работает пачками: тексты пачки сначала ищутся в кэше сводок, остальные
+    суммаризируются на пуле процессов, сводки записываются одним bulk update
+    и коммитятся. Возвращает число обработанных статей.
+    """
+    workers = workers or Config.SUMMARY_WORKERS
+    batch_size = batch_size or Config.SUMMARY_BATCH_SIZE
+    processed = 0
+    last_id = 0
+
+    while limit is None or processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        rows = db.session.query(
+            Article.id, Article.title, Article.description, Article.content, Article.story_id
+        ).filter(
+            Article.summary.is_(None),
+            Article.id > last_id
+        )
+        if ids is not None:
+            rows = rows.filter(Article.id.in_(ids))
+        rows = rows.order_by(Article.id).limit(size).all()
+
+        if not rows:
+            break
+
+        # Дубликаты сюжета получают сводку представителя вместо своей суммаризации
+        batch_ids = {row.id for row in rows}
+        story_ids = {row.story_id for row in rows if row.story_id} - batch_ids
+        shared = dict(db.session.query(Article.id, Article.summary).filter(
+            Article.id.in_(story_ids),
+            Article.summary.isnot(None)
+        ).all()) if story_ids else {}
+        own = [row for row in rows if row.story_id not in shared and row.story_id not in batch_ids]
+
+        jobs = [summary_input(row.title, row.description, row.content) for row in own]
+        summaries = cached_summarize(
+            [job for job in jobs if job[0].strip()], workers=workers
+        )
+
+        results = iter(summaries)
+        for row, (text, _) in zip(own, jobs):
+            summary = next(results) if text.strip() else ""
+            if summary is None:
+                summary = fallback_summary(row.description)
+            shared[row.id] = summary
+
+        own_ids = {row.id for row in own}
+        mappings = [
+            {'id': row.id, 'summary': shared[row.id if row.id in own_ids else row.story_id]}
+            for row in rows
+        ]
+
+        db.session.bulk_update_mappings(Article, mappings)
+        # Сводка входит в текст для оценки тем - пересчитываем их
+        index_topics_for_ids([row.id for row in rows])
+        DataVersion.bump()
+        db.session.commit()
+
+        processed += len(rows)
+        last_id = rows[-1].id
+        print(f"📝 Суммаризировано {processed} статей")
+
+    if processed:
+        evict_summaries()
+        # Сводки участвуют в подборе статей по теме
+        invalidate_article_caches()
+    return processed
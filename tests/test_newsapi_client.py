@@ -0,0 +1,166 @@
+# news_aggregator/tests/test_newsapi_client.py
+
+import json
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from newsapi_client import NewsAPIClient, NewsAPIError, MAX_PAGE_SIZE
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Локальный стенд NewsAPI: сценарий ответов задает тест через server.script"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.log.append({
+            'path': url.path, 'params': params, 'headers': dict(self.headers),
+            'at': time.monotonic()
+        })
+        status, body, headers = self.server.script(params, self.headers)
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def articles(total):
+    return [{'url': f'https://example.com/{index}', 'title': f'Статья {index}'}
+            for index in range(total)]
+
+
+def paged(total, page):
+    start = (page - 1) * MAX_PAGE_SIZE
+    return {'status': 'ok', 'totalResults': total,
+            'articles': articles(total)[start:start + MAX_PAGE_SIZE]}
+
+
+class NewsAPIClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+        self.server.log = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = NewsAPIClient(
+            api_key='test-key', base_url=f'http://127.0.0.1:{self.server.server_port}/v2',
+            timeout=5, retries=2, rate=1000, burst=1000, max_workers=2, page_workers=4
+        )
+
+    def tearDown(self):
+        self.client.pages.shutdown()
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_all_pages_are_fetched_up_to_total(self):
+        self.server.script = lambda params, headers: (200, paged(250, int(params['page'])), {})
+
+        response, result = self.client.everything({'sources': 'a,b'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([article['url'] for article in result],
+                         [article['url'] for article in articles(250)])
+        self.assertEqual(sorted(entry['params']['page'] for entry in self.server.log),
+                         ['1', '2', '3'])
+        for entry in self.server.log:
+            self.assertEqual(entry['params']['pageSize'], str(MAX_PAGE_SIZE))
+            self.assertEqual(entry['headers']['X-Api-Key'], 'test-key')
+            self.assertNotIn('apiKey', entry['params'])
+
+    def test_pages_are_fetched_concurrently_without_pool_overflow(self):
+        def script(params, headers):
+            if params['page'] != '1':
+                time.sleep(0.3)
+            return 200, paged(500, int(params['page'])), {}
+
+        self.server.script = script
+
+        started = time.monotonic()
+        with self.assertNoLogs('urllib3', level='WARNING'):
+            _, result = self.client.everything({'sources': 'a'})
+
+        self.assertEqual(len(result), 500)
+        # 4 страницы по 0.3 с в пуле из page_workers потоков, а не друг за другом
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    def test_max_pages_limits_paging(self):
+        self.client.max_pages = 2
+        self.server.script = lambda params, headers: (200, paged(1000, int(params['page'])), {})
+
+        _, result = self.client.everything({'sources': 'a'})
+
+        self.assertEqual(len(result), 2 * MAX_PAGE_SIZE)
+        self.assertEqual(len(self.server.log), 2)
+
+    def test_rate_limited_page_is_retried_after_retry_after(self):
+        limited = set()
+
+        def script(params, headers):
+            if params['page'] == '2' and '2' not in limited:
+                limited.add('2')
+                return 429, {'status': 'error', 'code': 'rateLimited', 'message': 'slow down'}, \
+                    {'Retry-After': '1'}
+            return 200, paged(150, int(params['page'])), {}
+
+        self.server.script = script
+
+        _, result = self.client.everything({'sources': 'a'})
+
+        self.assertEqual(len(result), 150)
+        retried = [entry['at'] for entry in self.server.log if entry['params']['page'] == '2']
+        self.assertEqual(len(retried), 2)
+        self.assertGreaterEqual(retried[1] - retried[0], 0.9)
+
+    def test_not_modified_first_page(self):
+        def script(params, headers):
+            if headers.get('If-None-Match') == '"v1"':
+                return 304, None, {}
+            return 200, paged(10, 1), {'ETag': '"v1"'}
+
+        self.server.script = script
+
+        response, result = self.client.everything({'sources': 'a'}, {'If-None-Match': '"v1"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertIsNone(result)
+        self.assertEqual(len(self.server.log), 1)
+
+    def test_maximum_results_reached_stops_paging(self):
+        def script(params, headers):
+            if params['page'] == '3':
+                return 426, {'status': 'error', 'code': 'maximumResultsReached',
+                             'message': 'upgrade'}, {}
+            return 200, paged(300, int(params['page'])), {}
+
+        self.server.script = script
+
+        _, result = self.client.everything({'sources': 'a'})
+
+        self.assertEqual(len(result), 2 * MAX_PAGE_SIZE)
+        self.assertEqual(sorted(entry['params']['page'] for entry in self.server.log),
+                         ['1', '2', '3'])
+
+    def test_api_error_is_raised_with_code(self):
+        self.server.script = lambda params, headers: (
+            401, {'status': 'error', 'code': 'apiKeyInvalid', 'message': 'bad key'}, {}
+        )
+
+        with self.assertRaises(NewsAPIError) as raised:
+            self.client.everything({'sources': 'a'})
+
+        self.assertEqual(raised.exception.code, 'apiKeyInvalid')
+        self.assertEqual(raised.exception.status_code, 401)
+        self.assertEqual(len(self.server.log), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
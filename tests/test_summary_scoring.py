@@ -0,0 +1,117 @@
+# news_aggregator/tests/test_summary_scoring.py
+
+import random
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from keyword_matcher import KeywordMatcher
+from summary_generator import (
+    KEYWORD_MATCHER, KEYWORD_TABLES, IMPORTANCE_KEYWORDS,
+    calculate_article_importance, calculate_importance_batch
+)
+
+NOW = datetime(2026, 10, 18, 12, 0, 0)
+
+
+def scan_counts(text, keywords):
+    """Прежний подсчет: text.count по каждому слову отдельно"""
+    return {keyword: text.count(keyword) for keyword in keywords if text.count(keyword)}
+
+
+def scan_importance(article, now):
+    """Прежняя скалярная оценка важности (цикл по ключевым словам)"""
+    score = 0
+    title = article.title.lower()
+    description = (article.description or '').lower()
+
+    for keyword in IMPORTANCE_KEYWORDS:
+        score += title.count(keyword) * 3
+        score += description.count(keyword) * 1
+
+    time_diff = now - article.published_at
+    if time_diff.total_seconds() < 3600:
+        score += 5
+    elif time_diff.total_seconds() < 3600 * 6:
+        score += 3
+    elif time_diff.days == 0:
+        score += 1
+
+    title_length = len(article.title.split())
+    if 5 <= title_length <= 12:
+        score += 2
+    if title_length < 3 or title_length > 20:
+        score -= 1
+
+    return max(0, score)
+
+
+def sample_texts(count, seed=13):
+    """Тексты из ключевых слов вперемешку с шумом, в т.ч. с наложениями слов"""
+    rng = random.Random(seed)
+    words = [keyword for table in KEYWORD_TABLES for keyword in table]
+    noise = ['и', 'в', 'на', 'заявил', 'сегодня', 'ааа', 'прези', 'россиякий', '']
+    texts = ['', 'путинпутин', 'президентпрезидент президент', 'россия российский россиянин']
+    for _ in range(count):
+        parts = [rng.choice(words if rng.random() < 0.4 else noise)
+                 for _ in range(rng.randint(0, 30))]
+        texts.append(rng.choice([' ', '', '-']).join(parts))
+    return texts
+
+
+def sample_articles(count, seed=7):
+    rng = random.Random(seed)
+    texts = sample_texts(count * 2, seed)
+    articles = []
+    for index in range(count):
+        # Возраст от "в будущем" до нескольких дней, включая границы интервалов
+        age = rng.choice([
+            -60, 0, 3599, 3600, 3601, 6 * 3600 - 1, 6 * 3600, 86399, 86400,
+            rng.randint(-3600, 4 * 86400)
+        ])
+        articles.append(SimpleNamespace(
+            title=texts[index * 2].capitalize() or 'Заголовок',
+            description=rng.choice([None, texts[index * 2 + 1]]),
+            published_at=NOW - timedelta(seconds=age, microseconds=rng.randint(0, 999999))
+        ))
+    return articles
+
+
+class KeywordMatcherTest(unittest.TestCase):
+
+    def test_counts_match_per_keyword_scan(self):
+        for text in sample_texts(300):
+            self.assertEqual(KEYWORD_MATCHER.count(text), scan_counts(text, KEYWORD_MATCHER.keywords))
+
+    def test_total_matches_sum_of_counts(self):
+        for text in sample_texts(100, seed=3):
+            self.assertEqual(
+                KEYWORD_MATCHER.total(text, IMPORTANCE_KEYWORDS),
+                sum(text.count(keyword) for keyword in IMPORTANCE_KEYWORDS)
+            )
+
+    def test_overlapping_keywords(self):
+        matcher = KeywordMatcher(['аа', 'а', 'аба', 'ба'])
+        for text in ['ааааа', 'абабаба', 'абаабаба', 'бабаа']:
+            self.assertEqual(matcher.count(text), scan_counts(text, matcher.keywords))
+
+
+class ImportanceTest(unittest.TestCase):
+
+    def test_scalar_matches_old_scan(self):
+        for article in sample_articles(300):
+            self.assertEqual(calculate_article_importance(article, NOW), scan_importance(article, NOW))
+
+    def test_batch_matches_scalar(self):
+        articles = sample_articles(300, seed=11)
+        scores = calculate_importance_batch(articles, NOW)
+        self.assertEqual(
+            [int(score) for score in scores],
+            [calculate_article_importance(article, NOW) for article in articles]
+        )
+
+    def test_batch_empty(self):
+        self.assertEqual(len(calculate_importance_batch([], NOW)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
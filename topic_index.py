@@ -0,0 +1,106 @@
+# news_aggregator/topic_index.py
+
+from sqlalchemy.orm import joinedload
+from models import db, Article, ArticleTopic, DataVersion
+from summary_generator import TOPIC_KEYWORDS, score_topics
+from story_clusters import collapse_stories
+
+
+def index_article_topics(articles):
+    """Пересчитывает и сохраняет оценки тем для статей (без commit).
+
+    articles - объекты или строки с полями id, title, description, summary,
+    published_at, source_id. Старые оценки этих статей заменяются.
+    """
+    articles = list(articles)
+    if not articles:
+        return 0
+
+    ids = [article.id for article in articles]
+    ArticleTopic.query.filter(ArticleTopic.article_id.in_(ids)).delete(synchronize_session=False)
+
+    mappings = []
+    for article in articles:
+        scores = score_topics(article.title, article.description, article.summary)
+        for topic, score in scores.items():
+            mappings.append({
+                'article_id': article.id,
+                'topic': topic,
+                'score': score,
+                'published_at': article.published_at,
+                'source_id': article.source_id
+            })
+
+    if mappings:
+        db.session.bulk_insert_mappings(ArticleTopic, mappings)
+    return len(mappings)
+
+
+def index_topics_for_ids(article_ids, chunk_size=500):
+    """Загружает статьи по id пачками и пересчитывает их оценки тем (без commit)"""
+    article_ids = list(article_ids)
+    total = 0
+    for start in range(0, len(article_ids), chunk_size):
+        chunk = article_ids[start:start + chunk_size]
+        rows = db.session.query(
+            Article.id, Article.title, Article.description, Article.summary,
+            Article.published_at, Article.source_id
+        ).filter(Article.id.in_(chunk)).all()
+        total += index_article_topics(rows)
+    return total
+
+
+def backfill_topics(batch_size=500):
+    """Пересчитывает оценки тем для всех статей, возвращает число статей"""
+    processed = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            Article.id, Article.title, Article.description, Article.summary,
+            Article.published_at, Article.source_id
+        ).filter(Article.id > last_id).order_by(Article.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        index_article_topics(rows)
+        DataVersion.bump()
+        db.session.commit()
+        processed += len(rows)
+        last_id = rows[-1].id
+    return processed
+
+
+def topic_articles(topic, source_ids=None, limit=15, candidates=100):
+    """Статьи по теме через индекс article_topic.
+
+    Берет candidates самых свежих статей темы по всему корпусу (а не только
+    среди последних 100 статей вообще) и возвращает limit самых релевантных,
+    при равной релевантности - более свежие.
+    """
+    query = topic_scope(topic, source_ids, limit, candidates)
+    return None if query is None else query.all()
+
+
+def topic_scope(topic, source_ids=None, limit=15, candidates=100):
+    """Запрос статей темы для topic_articles без загрузки; None - тема неизвестна"""
+    if topic not in TOPIC_KEYWORDS:
+        return None
+    return topic_query(topic, source_ids, limit, candidates)
+
+
+def topic_query(topic, source_ids=None, limit=15, candidates=100):
+    """Запрос для topic_articles (без проверки темы)"""
+    recent = db.session.query(
+        ArticleTopic.article_id, ArticleTopic.score, ArticleTopic.published_at
+    ).filter(ArticleTopic.topic == topic)
+    if source_ids:
+        recent = recent.filter(ArticleTopic.source_id.in_(source_ids))
+    recent = recent.order_by(ArticleTopic.published_at.desc()).limit(candidates).subquery()
+
+    query = collapse_stories(Article.query, source_ids)
+    return query.options(joinedload(Article.source)).join(
+        recent, recent.c.article_id == Article.id
+    ).order_by(
+        recent.c.score.desc(),
+        recent.c.published_at.desc()
+    ).limit(limit)